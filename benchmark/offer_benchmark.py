@@ -0,0 +1,73 @@
+"""
+Benchmark of the cheapest qualifying offer selection on synthetic listings.
+
+    python -m benchmark.offer_benchmark [--sizes 1000,100000,1000000]
+
+Compares the pure Python path (select_best_offers) with OfferBatch: building
+the batch once, then the vectorized mask and argmin of each filter.
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from utils.dd_utils import DD373Product, FilterParams, select_best_offers
+from utils.offer_batch import OfferBatch
+
+SERVERS = ["国服/赛季服", "亚服/永久服", "台服/硬核赛季"]
+
+
+def make_offers(count: int, seed: int = 373) -> List[DD373Product]:
+    rng = random.Random(seed)
+    offers = []
+    for index in range(count):
+        price = round(rng.uniform(0.01, 300), 2)
+        offer = DD373Product(
+            title=f"offer {index}",
+            server_info=rng.choice(SERVERS),
+            pack_price=price,
+            pack_stock=rng.randint(0, 500),
+            exchange_rate_2=f"1钻={price:.4f}元" if rng.random() > 0.05 else "",
+            credit_rating=rng.randint(1, 15),
+        )
+        offer.normalize()
+        offers.append(offer)
+    return offers
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def benchmark_size(count: int, filters: List[FilterParams]) -> None:
+    offers = make_offers(count)
+    python_best, python_seconds = _timed(lambda: [select_best_offers(offers, f) for f in filters])
+    batch, build_seconds = _timed(lambda: OfferBatch.from_products(offers))
+    batch_best, batch_seconds = _timed(lambda: [batch.best(f) for f in filters])
+    same = all((expected[0] if expected else None) is got for expected, got in zip(python_best, batch_best))
+    per_filter = len(filters)
+    print(f"{count:>9} offers: python {python_seconds / per_filter * 1000:9.2f} ms/filter | "
+          f"batch build {build_seconds * 1000:9.2f} ms, {batch_seconds / per_filter * 1000:8.3f} ms/filter "
+          f"| same offer: {same}")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    args = parser.parse_args(argv)
+
+    filters = []
+    for stock_min, level_min in ((0, 0), (10, 5), (100, 11), (490, 15)):
+        filter_params = FilterParams()
+        filter_params.stock_min = stock_min
+        filter_params.level_min = level_min
+        filters.append(filter_params)
+
+    for size in args.sizes.split(","):
+        benchmark_size(int(size), filters)
+
+
+if __name__ == "__main__":
+    main()
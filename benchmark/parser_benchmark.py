@@ -0,0 +1,137 @@
+"""
+Offline benchmark of the DD373 listing parsers over the hand-built page corpus.
+
+    python -m benchmark.parser_benchmark [--rounds N] [page.html ...]
+
+For every page: time per page and items/sec of each parser backend and of
+get_dd373_listings (served by a recorded driver), peak memory of a parse, the
+cost of each extracted field, and the challenge solving time of challenge pages.
+
+The corpus pages are hand-built on the layouts handled by the extraction plan
+(new layout, .kucun fallback, .width233, challenge, empty result); saved real
+pages can be dropped next to them.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from utils import dd_utils, listing_cache
+from utils.dd_http import find_challenge_arg1, is_challenge_page, solve_acw_sc_v2
+from utils.dd_parsers import PARSER_BACKENDS, select_item_elements
+from utils.extraction_plan import EXTRACTION_PLAN
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+CORPUS_URL = "https://www.dd373.com/s-corpus-{name}.html"
+
+
+class RecordedDriver:
+    """Stands in for the Selenium driver: serves corpus pages by url, always ready."""
+
+    def __init__(self, pages: Dict[str, str]):
+        self.pages = pages
+        self.current_url = ""
+        self.page_source = ""
+
+    def get(self, url: str) -> None:
+        self.current_url = url
+        self.page_source = self.pages[url]
+
+    def execute_script(self, script: str, *args):
+        if script.startswith("return !!("):
+            return True  # Readiness strategies
+        return [len(self.page_source.encode("utf-8")), 0.0]  # Page load timing
+
+    def get_cookies(self) -> list:
+        return []
+
+
+def _median_seconds(func: Callable[[], object], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _peak_memory_kb(func: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _report_line(label: str, seconds: float, items: int, peak_kb: float) -> str:
+    items_per_sec = items / seconds if seconds else 0.0
+    return f"  {label:<20} {seconds * 1000:8.2f} ms/page {items_per_sec:10.0f} items/s {peak_kb:9.0f} KB peak"
+
+
+def benchmark_page(name: str, html: str, rounds: int) -> None:
+    print(f"{name} ({len(html.encode('utf-8')) / 1024:.0f} KB)")
+    if is_challenge_page(html):
+        arg1 = find_challenge_arg1(html)
+        if arg1:
+            seconds = _median_seconds(lambda: solve_acw_sc_v2(arg1), rounds)
+            print(f"  challenge page, solved in {seconds * 1e6:.1f} us")
+        else:
+            print("  challenge page without arg1")
+
+    for backend in PARSER_BACKENDS:
+        def parse():
+            return dd_utils.parse_dd373_listings(html, backend=backend)
+        items = len(parse())
+        print(_report_line(backend, _median_seconds(parse, rounds), items, _peak_memory_kb(parse)))
+
+    # Whole pipeline after the network: driver, readiness, fingerprint, parse, cache
+    url = CORPUS_URL.format(name=name)
+    driver = RecordedDriver({url: html})
+
+    def get_listings():
+        dd_utils.listing_fingerprints = dd_utils.ListingFingerprints()
+        with contextlib.redirect_stdout(io.StringIO()):
+            return dd_utils.get_dd373_listings(url, driver)
+    items = len(get_listings())
+    print(_report_line("get_dd373_listings", _median_seconds(get_listings, rounds), items,
+                       _peak_memory_kb(get_listings)))
+
+    elements = select_item_elements(html)
+    if not elements:
+        return
+    costs = []
+    for field in EXTRACTION_PLAN.fields:
+        def read_field():
+            for element in elements:
+                EXTRACTION_PLAN.reader(element)(field)
+        costs.append((field, _median_seconds(read_field, rounds) / len(elements)))
+    print("  field cost (bs4, us/item): " + ", ".join(f"{field} {cost * 1e6:.1f}" for field, cost in costs))
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="html files, the corpus by default")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    # No network and no cache: every get_dd373_listings call loads and parses its page
+    os.environ["DD_FETCH_MODE"] = dd_utils.FETCH_MODE_SELENIUM
+    os.environ["DD_EXTRACT_MODE"] = "html"
+    os.environ.pop("DD_PERSIST_PROFILE", None)
+    listing_cache._listing_cache = listing_cache.ListingCache(ttl=0)
+
+    paths = args.pages or sorted(glob.glob(os.path.join(CORPUS_DIR, "*.html")))
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        benchmark_page(os.path.splitext(os.path.basename(path))[0], html, max(1, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Memory held by parsed DD373Product objects, and the cost of exporting them.
+
+    python -m benchmark.product_memory [--count 100000] [page.html]
+
+The items of a corpus page are built into distinct products (each copy gets its
+own title, urls and rates), as when many pages of listings stay cached.
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from typing import List
+
+from utils.dd_parsers import ItemFields, parse_items_lxml
+from utils.dd_utils import DD373Product
+
+DEFAULT_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "new_layout.html")
+
+
+def _unique_url(url: str, suffix: str) -> str:
+    # Before the extension, so that the product id read from the url is unique too
+    base, dot, extension = url.rpartition(".")
+    return f"{base}{suffix}.{extension}" if dot else url + suffix
+
+
+def distinct_items(items: List[ItemFields], count: int) -> List[ItemFields]:
+    """count items cycling over the page ones, with unique strings but the server names."""
+    distinct = []
+    for index in range(count):
+        item = items[index % len(items)]
+        suffix = f"-{index}"
+        distinct.append(item._replace(
+            title=(item.title or "") + suffix,
+            title_href=_unique_url(item.title_href or "/detail-0.html", suffix),
+            buy_href=_unique_url(item.buy_href or "/buy-0.html", suffix),
+            kucun_rates=[rate + suffix for rate in item.kucun_rates] if item.kucun_rates else item.kucun_rates,
+            width233_rates=[rate + suffix for rate in item.width233_rates] if item.width233_rates else item.width233_rates,
+        ))
+    return distinct
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("page", nargs="?", default=DEFAULT_PAGE)
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    with open(args.page, encoding="utf-8") as f:
+        items = parse_items_lxml(f.read())
+    if not items:
+        raise SystemExit(f"No items in {args.page}")
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    products = [DD373Product.from_item_fields(item) for item in distinct_items(items, args.count)]
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{len(products)} products: {held / 1024 / 1024:.1f} MB, {held / len(products):.0f} bytes/product")
+
+    for name, export in (("to_record", DD373Product.to_record), ("to_dict", DD373Product.to_dict)):
+        start = time.perf_counter()
+        for product in products:
+            export(product)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {elapsed / len(products) * 1e6:.2f} us/product")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,19 @@ DESTINATION_RANGE = "G{n}:Q{n}"
 INFORMATION_RANGE = "G{n}:H{n}"
 TIMEOUT = 15
 REFRESH_TIME = 10
+LISTING_CACHE_TTL = REFRESH_TIME  # Seconds a parsed listing page stays fresh
+LISTING_CACHE_MAX_PRODUCTS = 20000
+DD_DOMAIN = "https://www.dd373.com"
+DD_FETCH_MODE = "selenium"  # "selenium", "http" or "bridge"
+USER_DATA_PATH = "user_data"
+DD_MAX_PAGES = 3  # Pages read of price sorted searches when page 1 has no qualifying offer
+DD_PRICE_SORT_VALUES = ("3",)  # Sort segment values of search urls ordered by price
+PARSE_WORKERS = 2  # Processes parsing fetched pages, 0 parses in the calling thread
+PARSE_INLINE_BYTES = 64 * 1024  # Smaller pages are parsed in the calling thread
+PARSE_BATCH_BYTES = 1024 * 1024  # Pages sent to a parse worker at once
+OFFER_BATCH_MIN_OFFERS = 256  # Listings at least this long are ranked as NumPy columns
+CHROMEDRIVER_MANIFEST_PATH = os.path.join(USER_DATA_PATH, "chromedriver_manifest.json")
+COOKIE_STORE_PATH = os.path.join(USER_DATA_PATH, "cookies.json")
 LOG_FILE = "function_calls.log"
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(message)s"
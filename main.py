@@ -1,32 +1,38 @@
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Optional
 
 from dotenv import load_dotenv
 from gspread.exceptions import APIError
 from gspread.utils import a1_to_rowcol
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.webdriver import WebDriver
-from webdriver_manager.chrome import ChromeDriverManager
 
 import constants
 from app.process import get_row_run_index
 from decorator.retry import retry
 from decorator.time_execution import time_execution
 from model.payload import Row
-from utils.dd_utils import get_dd_min_price
-from utils.exceptions import PACrawlerError
+from utils.dd_utils import (
+    DD373Product,
+    FilterParams,
+    crawl_dd373_listings,
+    get_dd373_listings,
+    get_dd373_listings_multi,
+    get_dd373_next_pages,
+    get_dd_min_price,
+    has_more_pages,
+    is_http_fetch_mode,
+    listing_fingerprints,
+    needs_more_pages,
+)
+from utils.exceptions import DriverCrashedError, PACrawlerError
 from utils.ggsheet import GSheet, Sheet
+from utils.listing_cache import get_listing_cache
 from utils.logger import setup_logging
-
-### SETUP ###
-load_dotenv("settings.env")
-
-setup_logging()
-gs = GSheet()
-
+from utils.selenium_utils import DriverPool
 
 ### FUNCTIONS ###
 
@@ -35,7 +41,7 @@ gs = GSheet()
 @retry(5, delay=15, exception=PACrawlerError)
 def process(
     gsheet: GSheet,
-    driver: WebDriver
+    driver_pool: DriverPool
 ):
     print("process")
     try:
@@ -56,30 +62,156 @@ def process(
         print(f"Error getting worksheet: {e}")
         return
     row_indexes = get_row_run_index(worksheet=worksheet)
+    rows = {index: load_row(worksheet, index) for index in row_indexes}
+    rows = {index: row for index, row in rows.items() if row is not None}
+
+    # Rows sharing a product link only differ in their filters, load each link once
+    groups: dict[str, dict[int, Row]] = {}
+    for index, row in rows.items():
+        link = row.dd.DD_PRODUCT_LINK
+        if not isinstance(link, str) or not link.strip():
+            print(f"Row {index}: no product link, skipped")
+            continue
+        groups.setdefault(link, {})[index] = row
+    stats = CycleStats(rows=sum(len(url_rows) for url_rows in groups.values()), urls=len(groups))
+
+    with ThreadPoolExecutor(max_workers=driver_pool.size) as executor:
+        prefetched = prefetch_listings(
+            executor, driver_pool, [row for url_rows in groups.values() for row in url_rows.values()]
+        )
+        # Each row only writes its own cells, so rows can finish in any order
+        for future in as_completed(
+            executor.submit(
+                process_url_rows, worksheet, url, url_rows, driver_pool, stats, prefetched.get(url)
+            ) for url, url_rows in groups.items()
+        ):
+            future.result()
+    print(stats.summary())
+    print(get_listing_cache().summary())
+    print(listing_fingerprints.summary())
+
+
+# Row index -> (listings, row settings) of the last result written to the sheet
+_last_row_results: dict[int, tuple[list[DD373Product], tuple]] = {}
+
+
+@dataclass
+class CycleStats:
+    rows: int = 0
+    urls: int = 0
+    fetches: int = 0
+    found: int = 0
+    not_found: int = 0
+    unchanged: int = 0
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def summary(self) -> str:
+        return (f"Cycle: {self.rows} rows, {self.urls} unique urls, {self.fetches} fetches, "
+                f"{self.rows - self.urls} rows saved by deduplication, "
+                f"{self.found} found, {self.not_found} not found, {self.errors} errors, "
+                f"{self.unchanged} unchanged ({self.unchanged / self.rows * 100 if self.rows else 0:.1f}% "
+                f"sheet writes skipped)")
+
 
-    for index in row_indexes:
-        status = "NOT FOUND"
-        print(f"Row: {index}")
+def load_row(
+    worksheet,
+    index: int
+) -> Optional[Row]:
+    try:
+        row = Row.from_row_index(worksheet, index)
+    except Exception as e:
+        print(f"Error getting row: {e}")
+        _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        write_to_log_cell(worksheet, index, "Error: " + _current_time, log_type="time")
+        return None
+    if not isinstance(row, Row):
+        return None
+    return row
+
+
+def prefetch_listings(
+    executor: ThreadPoolExecutor,
+    driver_pool: DriverPool,
+    rows: list[Row]
+) -> dict[str, list[DD373Product]]:
+    """
+    Load the listings of all rows up front: concurrently over HTTP in the http
+    and bridge fetch modes, or in browser tabs when DD_TAB_COUNT > 1.
+
+    Urls that fail here are left out and loaded again by their row.
+    """
+    urls = list(dict.fromkeys(row.dd.DD_PRODUCT_LINK for row in rows))
+    if is_http_fetch_mode():
+        prefetched = {}
         try:
-            row = Row.from_row_index(worksheet, index)
+            results = crawl_dd373_listings(urls)
         except Exception as e:
-            print(f"Error getting row: {e}")
-            _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            write_to_log_cell(worksheet, index, "Error: " + _current_time, log_type="time")
-            continue
-        if not isinstance(row, Row):
-            continue
+            print(f"Error loading listings over HTTP: {e}")
+            return {}
+        for url, listings in results.items():
+            if isinstance(listings, Exception):
+                print(f"Error loading {url} over HTTP: {listings}")
+            else:
+                prefetched[url] = listings
+        return prefetched
+
+    tab_count = get_tab_count()
+    if tab_count <= 1:
+        return {}
+    chunks = [urls[i:i + tab_count] for i in range(0, len(urls), tab_count)]
+
+    def _fetch_chunk(chunk):
         try:
-            min_price = get_dd_min_price(row.dd, driver)
-            if min_price is None:
-                print("No item info")
+            with driver_pool.driver() as driver:
+                return get_dd373_listings_multi(chunk, driver, tab_count)
+        except Exception as e:
+            print(f"Error loading tabs: {e}")
+            return {}
+
+    prefetched = {}
+    for result in executor.map(_fetch_chunk, chunks):
+        for url, listings in result.items():
+            if isinstance(listings, Exception):
+                print(f"Error loading {url} in tab: {listings}")
             else:
-                print(f"Min price: {min_price[0]}")
-                print(f"Title: {min_price[1]}")
-                status = "FOUND"
-                write_to_log_cell(worksheet, index, min_price[0], log_type="price")
-                write_to_log_cell(worksheet, index, min_price[1], log_type="title")
-                write_to_log_cell(worksheet, index, min_price[2], log_type="stock")
+                prefetched[url] = listings
+    return prefetched
+
+
+@retry(2, delay=1, exception=DriverCrashedError)
+def get_url_listings(
+    url: str,
+    driver_pool: DriverPool
+) -> list[DD373Product]:
+    # A crashed driver is replaced by the pool, so the url is retried once on a new one
+    with driver_pool.lazy_driver() as driver:
+        return get_dd373_listings(url, driver)
+
+
+def process_url_rows(
+    worksheet,
+    url: str,
+    rows: dict[int, Row],
+    driver_pool: DriverPool,
+    stats: CycleStats,
+    listings: Optional[list[DD373Product]] = None
+):
+    if listings is None:
+        try:
+            listings = get_url_listings(url, driver_pool)
+            stats.add(fetches=1)
+        except Exception as e:
+            print(f"Error calculating price change: {e}")
+            stats.add(errors=len(rows))
+            return
+        finally:
+            # Only urls loaded here are paced, prefetched ones were paced per host
             try:
                 _row_time_sleep = float(os.getenv("ROW_TIME_SLEEP"))
                 print(f"Sleeping for {_row_time_sleep} seconds")
@@ -87,14 +219,69 @@ def process(
             except Exception as e:
                 print("No row time sleep, sleeping for 3 seconds by default")
                 time.sleep(3)
+    else:
+        stats.add(fetches=1)
 
+    filters = [FilterParams.from_dd(row.dd) for row in rows.values()]
+    if has_more_pages(url) and needs_more_pages(listings, filters):
+        try:
+            # Pages served over HTTP never start a browser
+            with driver_pool.lazy_driver() as driver:
+                listings = get_dd373_next_pages(url, listings, filters, driver)
         except Exception as e:
-            print(f"Error calculating price change: {e}")
-            continue
-        write_to_log_cell(worksheet, index, status, log_type="status")
+            print(f"Error loading next pages: {e}")
+
+    for index, row in rows.items():
+        process_row(worksheet, index, row, listings, stats)
+
+
+def process_row(
+    worksheet,
+    index: int,
+    row: Row,
+    listings: list[DD373Product],
+    stats: CycleStats
+):
+    status = "NOT FOUND"
+    written = []
+    print(f"Row: {index}")
+    row_key = (row.dd.DD_PRODUCT_LINK, row.dd.DD_STOCKMIN, row.dd.DD_LEVELMIN)
+    previous = _last_row_results.get(index)
+    if previous is not None and previous[0] is listings and previous[1] == row_key:
+        # Same listings object means the page did not change, nor did the result
+        print("Listings unchanged, only updating time")
+        stats.add(unchanged=1)
         _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
         write_to_log_cell(worksheet, index, _current_time, log_type="time")
-        print("Next row...")
+        return
+    try:
+        min_price = get_dd_min_price(row.dd, None, listings)
+        if min_price is None:
+            print("No item info")
+            stats.add(not_found=1)
+        else:
+            print(f"Min price: {min_price[0]}")
+            print(f"Title: {min_price[1]}")
+            status = "FOUND"
+            stats.add(found=1)
+            written = [
+                write_to_log_cell(worksheet, index, min_price[0], log_type="price"),
+                write_to_log_cell(worksheet, index, min_price[1], log_type="title"),
+                write_to_log_cell(worksheet, index, min_price[2], log_type="stock"),
+            ]
+    except Exception as e:
+        print(f"Error calculating price change: {e}")
+        stats.add(errors=1)
+        return
+    written.append(write_to_log_cell(worksheet, index, status, log_type="status"))
+    _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    written.append(write_to_log_cell(worksheet, index, _current_time, log_type="time"))
+    # A failed write is retried on the next cycle instead of being skipped as unchanged
+    if all(written):
+        _last_row_results[index] = (listings, row_key)
+    else:
+        _last_row_results.pop(index, None)
+    print("Next row...")
 
 
 def write_to_log_cell(
@@ -102,7 +289,8 @@ def write_to_log_cell(
     row_index,
     log_str,
     log_type="log"
-):
+) -> bool:
+    """Returns whether the cell was written."""
     try:
         r, c = None, None
         if log_type == "status":
@@ -116,33 +304,40 @@ def write_to_log_cell(
         if log_type == "stock":
             r, c = a1_to_rowcol(f"K{row_index}")
         worksheet.update_cell(r, c, log_str)
+        return True
     except Exception as e:
         print(f"Error writing to log cell: {e}")
+        return False
+
+
+def get_driver_pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("DRIVER_POOL_SIZE")))
+    except Exception:
+        return 1
 
 
-def create_selenium_driver():
-    options = Options()
-    prefs = {"profile.default_content_setting_values.popups": 2}  # 2 = Block, 1 = Allow
-    options.add_experimental_option("prefs", prefs)
-    options.add_argument("--disable-notifications")  # Disables browser notification prompts
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])  # Hides "Chrome is being controlled" bar
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    print("Driver created")
-    return driver
+def get_tab_count() -> int:
+    try:
+        return max(1, int(os.getenv("DD_TAB_COUNT")))
+    except Exception:
+        return 1
 
 
 ### MAIN ###
 
 if __name__ == "__main__":
+    # Setup stays here: parse workers (spawn) import this module as __mp_main__
+    # and inherit the environment loaded by the parent
+    load_dotenv("settings.env")
+    setup_logging()
+
     print("Starting...")
     gsheet = GSheet(constants.KEY_PATH)
-    sd = create_selenium_driver()
+    pool = DriverPool(get_driver_pool_size())
     while True:
         try:
-            process(gsheet, sd)
+            process(gsheet, pool)
             try:
                 _time_sleep = float(os.getenv("TIME_SLEEP"))
             except Exception:
@@ -2,6 +2,7 @@ import re
 
 from pydantic import BaseModel
 from enum import Enum
+from .ranking import OfferRanker
 from .sheet_model import G2G, FUN
 
 
@@ -74,12 +75,10 @@ class OfferItem(BaseModel):
     def min_offer_item(
         offer_items: list["OfferItem"],
     ) -> "OfferItem":
-        min = offer_items[0]
-        for offer_item in offer_items:
-            if offer_item.price < min.price:  # type: ignore
-                min = offer_item
+        return _OFFER_PRICE_RANKER.min(offer_items)
 
-        return min
+
+_OFFER_PRICE_RANKER: OfferRanker[OfferItem] = OfferRanker(key="price")
 
 
 class G2GOfferItem(BaseModel):
@@ -125,12 +124,10 @@ class G2GOfferItem(BaseModel):
     def min_offer_item(
         g2g_offer_items: list["G2GOfferItem"],
     ) -> "G2GOfferItem":
-        min = g2g_offer_items[0]
-        for g2g_offer_item in g2g_offer_items:
-            if g2g_offer_item.price_per_unit < min.price_per_unit:
-                min = g2g_offer_item
+        return _G2G_PRICE_RANKER.min(g2g_offer_items)
+
 
-        return min
+_G2G_PRICE_RANKER: OfferRanker[G2GOfferItem] = OfferRanker(key="price_per_unit")
 
 
 def extract_integers_from_string(s):
@@ -184,9 +181,7 @@ class FUNOfferItem(BaseModel):
     def min_offer_item(
         fun_offer_items: list["FUNOfferItem"],
     ) -> "FUNOfferItem":
-        min_fun_offer_item = fun_offer_items[0]
-        for fun_offer_item in fun_offer_items:
-            if fun_offer_item.price < min_fun_offer_item.price:
-                min_fun_offer_item = fun_offer_item
+        return _FUN_PRICE_RANKER.min(fun_offer_items)
+
 
-        return min_fun_offer_item
+_FUN_PRICE_RANKER: OfferRanker[FUNOfferItem] = OfferRanker(key="price")
@@ -0,0 +1,155 @@
+import heapq
+import operator
+from dataclasses import dataclass
+from itertools import compress
+from typing import Any, Callable, Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Offers at least this many, given as a sequence, are ranked as NumPy columns
+VECTORIZE_MIN_OFFERS = 4096
+
+_OPERATORS = {
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "eq": operator.eq,
+    "in": lambda value, values: value in values,
+    "not_in": lambda value, values: value not in values,
+}
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """
+    An offer passes when `offer.<field> <op> value`, e.g.
+    Predicate("stock", "ge", 10) or Predicate("seller_name", "not_in", blacklist).
+    field may be dotted ("delivery_time.value").
+    """
+    field: str
+    op: str
+    value: Any
+
+    def __post_init__(self):
+        if self.op not in _OPERATORS:
+            raise ValueError(f"Unknown predicate operator: {self.op}")
+
+    def compile(self) -> Callable[[Any], bool]:
+        get = operator.attrgetter(self.field)
+        compare = _OPERATORS[self.op]
+        value = self.value
+        return lambda offer: compare(get(offer), value)
+
+
+class OfferRanker(Generic[T]):
+    """
+    Filters offers with predicates and ranks them by ascending key field, in a
+    single pass over any iterable. Ties go to the earliest offer, as in the
+    `if offer.price < min.price` loops it replaces.
+    """
+
+    def __init__(self, key: str, predicates: Sequence[Predicate] = ()):
+        self.key = key
+        self.predicates = tuple(predicates)
+        self._get_key = operator.attrgetter(key)
+        self._checks = tuple(predicate.compile() for predicate in self.predicates)
+
+    def accepts(self, offer: T) -> bool:
+        for check in self._checks:
+            if not check(offer):
+                return False
+        return True
+
+    def filter(self, offers: Iterable[T]) -> List[T]:
+        return [offer for offer in offers if self.accepts(offer)]
+
+    def best(self, offers: Iterable[T], good_enough: Optional[float] = None) -> Optional[T]:
+        """
+        Offer with the lowest key among the accepted ones, None if there is none.
+
+        With good_enough, the first accepted offer whose key is at or below it
+        is returned right away, without reading the rest.
+        """
+        if good_enough is None and _is_large(offers):
+            index = self._best_index_vectorized(offers)
+            return offers[index] if index is not None else None
+
+        best_offer = None
+        best_key = None
+        for offer in offers:
+            if not self.accepts(offer):
+                continue
+            key = self._rank_key(offer)
+            if best_offer is None or key < best_key:
+                best_offer, best_key = offer, key
+                if good_enough is not None and key <= good_enough:
+                    break
+        return best_offer
+
+    def min(self, offers: Iterable[T]) -> T:
+        """Same as best, but an empty result raises IndexError like offers[0] did."""
+        best_offer = self.best(offers)
+        if best_offer is None:
+            raise IndexError("No offer to rank")
+        return best_offer
+
+    def top_k(self, offers: Iterable[T], k: int) -> List[T]:
+        """The k best accepted offers, best first, with a bounded heap."""
+        if _is_large(offers):
+            return [offers[index] for index in self._top_k_indexes_vectorized(offers, k)]
+        candidates = (
+            (self._rank_key(offer), index, offer)
+            for index, offer in enumerate(offers)
+            if self.accepts(offer)
+        )
+        return [candidate[2] for candidate in heapq.nsmallest(k, candidates, key=lambda c: c[:2])]
+
+    def _rank_key(self, offer: T) -> Any:
+        key = self._get_key(offer)
+        # NaN never compares lower and None not at all: both paths reject them alike
+        if key is None or key != key:
+            raise TypeError(f"Offer has no {self.key} to rank by: {key!r}")
+        return key
+
+    def _columns(self, offers: Sequence[T]) -> Tuple[np.ndarray, np.ndarray]:
+        """Accepted indexes and the key column of a sequence of offers."""
+        count = len(offers)
+        mask = np.ones(count, dtype=bool)
+        for predicate in self.predicates:
+            values = list(map(operator.attrgetter(predicate.field), offers))
+            compare = _OPERATORS[predicate.op]
+            # fromiter would turn None into NaN, failing the comparison instead of raising
+            if predicate.op not in ("in", "not_in") and not any(value is None for value in values):
+                try:
+                    mask &= compare(np.fromiter(values, dtype=np.float64, count=count), predicate.value)
+                    continue
+                except (TypeError, ValueError):
+                    pass  # Not numbers, compared one by one below
+            mask &= np.fromiter((compare(value, predicate.value) for value in values), dtype=bool, count=count)
+        candidates = np.flatnonzero(mask)
+        keys = np.fromiter(
+            map(self._get_key, compress(offers, mask)), dtype=np.float64, count=candidates.size
+        )
+        if np.isnan(keys).any():
+            index = int(candidates[np.flatnonzero(np.isnan(keys))[0]])
+            self._rank_key(offers[index])  # Raises as the scalar path does
+        return candidates, keys
+
+    def _best_index_vectorized(self, offers: Sequence[T]) -> Optional[int]:
+        candidates, keys = self._columns(offers)
+        if not candidates.size:
+            return None
+        # argmin returns the first occurrence of the minimum: earliest offer on ties
+        return int(candidates[np.argmin(keys)])
+
+    def _top_k_indexes_vectorized(self, offers: Sequence[T], k: int) -> List[int]:
+        candidates, keys = self._columns(offers)
+        order = np.argsort(keys, kind="stable")[:k]
+        return candidates[order].tolist()
+
+
+def _is_large(offers: Iterable) -> bool:
+    return isinstance(offers, Sequence) and len(offers) >= VECTORIZE_MIN_OFFERS
@@ -0,0 +1,146 @@
+import os
+import time
+import unittest
+
+import requests
+
+from utils.dd_http import (
+    CHALLENGE_COOKIE,
+    _ACW_MASK,
+    _ACW_POS_LIST,
+    _get,
+    find_challenge_arg1,
+    is_challenge_page,
+    solve_acw_sc_v2,
+    stream_dd373_html,
+)
+from utils.dd_parsers import iter_items_streaming, parse_items_bs4
+from utils.exceptions import DDChallengeError, DDCrawlerError
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark", "corpus")
+CHALLENGE_PAGE = os.path.join(CORPUS_DIR, "challenge.html")
+LISTING_PAGE = os.path.join(CORPUS_DIR, "new_layout.html")
+
+
+def _challenge_arg1(cookie: str) -> str:
+    """arg1 the challenge script turns into cookie: the inverse of the unsbox and hexXor steps."""
+    arg2 = "".join(f"{int(cookie[i:i + 2], 16) ^ int(_ACW_MASK[i:i + 2], 16):02x}" for i in range(0, len(cookie), 2))
+    arg1 = [""] * len(_ACW_POS_LIST)
+    for j, pos in enumerate(_ACW_POS_LIST):
+        arg1[pos - 1] = arg2[j]
+    return "".join(arg1).upper()
+
+
+class ChallengeTest(unittest.TestCase):
+
+    def test_solver_inverts_challenge(self):
+        for cookie in ("0" * 40, "f" * 40, "65f0a1c2d3e4b5a6978800112233445566778899"):
+            with self.subTest(cookie=cookie):
+                self.assertEqual(solve_acw_sc_v2(_challenge_arg1(cookie)), cookie)
+
+    def test_solver_output(self):
+        cookie = solve_acw_sc_v2("9955C3835393AA547ECAE58263F39E847DD25478")
+        self.assertEqual(len(cookie), 40)
+        self.assertEqual(_challenge_arg1(cookie), "9955C3835393AA547ECAE58263F39E847DD25478")
+
+    def test_find_arg1_in_challenge_page(self):
+        with open(CHALLENGE_PAGE, encoding="utf-8") as f:
+            html = f.read()
+        self.assertTrue(is_challenge_page(html))
+        self.assertEqual(find_challenge_arg1(html), "9955C3835393AA547ECAE58263F39E847DD25478")
+
+    def test_find_arg1_without_challenge(self):
+        self.assertIsNone(find_challenge_arg1("<html><script>var x='1';</script></html>"))
+        self.assertEqual(find_challenge_arg1('var arg1 = "ABC123";'), "ABC123")
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def test_spent_deadline_raises_before_requesting(self):
+        class Session:
+            def get(self, url, timeout, stream=False):
+                raise AssertionError("requested after the deadline")
+
+        with self.assertRaises(DDCrawlerError):
+            _get(Session(), "https://www.dd373.com/", 10, deadline=time.monotonic() - 1)
+
+    def test_timeout_is_capped_by_deadline(self):
+        timeouts = []
+
+        class Response:
+            headers = {"Content-Type": "text/html; charset=utf-8"}
+
+        class Session:
+            def get(self, url, timeout, stream=False):
+                timeouts.append(timeout)
+                return Response()
+
+        _get(Session(), "https://www.dd373.com/", 10, deadline=time.monotonic() + 2)
+        self.assertLessEqual(timeouts[0], 2)
+
+
+class _StreamedResponse:
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.body = body
+        self.status_code = status_code
+        self.encoding = "utf-8"
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            self.read = i + chunk_size
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class _StreamingSession:
+    """Serves the given responses in order."""
+
+    def __init__(self, *responses: _StreamedResponse):
+        self.responses = list(responses)
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+    def get(self, url, timeout, stream=False):
+        assert stream
+        return self.responses.pop(0)
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        with open(CHALLENGE_PAGE, "rb") as f:
+            self.challenge = f.read()
+        with open(LISTING_PAGE, "rb") as f:
+            self.listing = f.read()
+
+    def test_challenge_is_solved_then_page_streamed(self):
+        page = _StreamedResponse(self.listing)
+        session = _StreamingSession(_StreamedResponse(self.challenge), page)
+        chunks = stream_dd373_html("https://www.dd373.com/s-a-0-1-0-3-0.html", session)
+        self.assertIsNotNone(session.cookies.get(CHALLENGE_COOKIE))
+        # Only the first chunks were read to rule out the challenge
+        self.assertLess(page.read, len(self.listing))
+        self.assertEqual(list(iter_items_streaming(chunks)), parse_items_bs4(self.listing.decode("utf-8")))
+
+    def test_unsolved_challenge_raises(self):
+        session = _StreamingSession(*(_StreamedResponse(self.challenge) for _ in range(3)))
+        with self.assertRaises(DDChallengeError):
+            stream_dd373_html("https://www.dd373.com/", session)
+
+    def test_bridge_does_not_solve(self):
+        session = _StreamingSession(_StreamedResponse(self.challenge))
+        with self.assertRaises(DDChallengeError):
+            stream_dd373_html("https://www.dd373.com/", session, solve_challenge=False)
+        self.assertIsNone(session.cookies.get(CHALLENGE_COOKIE))
+
+    def test_http_error_raises(self):
+        session = _StreamingSession(_StreamedResponse(self.listing, status_code=503))
+        with self.assertRaises(DDCrawlerError):
+            stream_dd373_html("https://www.dd373.com/", session)
+
+
+if __name__ == "__main__":
+    unittest.main()
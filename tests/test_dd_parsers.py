@@ -0,0 +1,84 @@
+import glob
+import json
+import os
+import unittest
+from unittest import mock
+
+from utils.dd_parsers import PARSER_BACKENDS, get_parser_backend, iter_items_streaming, parse_items_bs4
+from utils.dd_utils import parse_dd373_listings
+from utils.extraction_plan import EXTRACTION_PLAN
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark", "corpus")
+# DD373Product.to_dict of every corpus item as parsed by the original
+# from_html_element, before the parser backends and the extraction plan
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "corpus_baseline.json")
+
+
+def _corpus():
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            yield os.path.basename(path), f.read()
+
+
+class ParserBackendsTest(unittest.TestCase):
+
+    def test_backends_match_bs4(self):
+        for name, html in _corpus():
+            expected = parse_items_bs4(html)
+            for backend, parse_items in PARSER_BACKENDS.items():
+                with self.subTest(page=name, backend=backend):
+                    self.assertEqual(parse_items(html), expected)
+
+    def test_products_match_baseline(self):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for name, html in _corpus():
+            expected = baseline[name]
+            for backend in PARSER_BACKENDS:
+                with self.subTest(page=name, backend=backend):
+                    products = [product.to_dict() for product in parse_dd373_listings(html, backend=backend)]
+                    self.assertEqual(len(products), len(expected))
+                    for product, baseline_product in zip(products, expected):
+                        self.assertEqual({key: product[key] for key in baseline_product}, baseline_product)
+
+    def test_baseline_covers_corpus(self):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        self.assertEqual(sorted(baseline), [name for name, _ in _corpus()])
+
+    def test_backend_without_a_plan_field_is_refused(self):
+        fields = dict(EXTRACTION_PLAN.fields, new_field=None)
+        with mock.patch.object(EXTRACTION_PLAN, "fields", fields):
+            self.assertIs(get_parser_backend("bs4"), PARSER_BACKENDS["bs4"])
+            for backend in ("lxml", "stream"):
+                with self.subTest(backend=backend), self.assertRaises(ValueError):
+                    get_parser_backend(backend)
+
+
+class StreamingTokenizerTest(unittest.TestCase):
+
+    def test_any_chunking_gives_the_same_items(self):
+        _, html = next((name, html) for name, html in _corpus() if name == "new_layout.html")
+        data = html.encode("utf-8")
+        expected = parse_items_bs4(html)
+        # Odd sizes split multibyte characters, tags and attributes
+        for size in (1, 7, 64, 4093):
+            with self.subTest(chunk_size=size):
+                chunks = [data[i:i + size] for i in range(0, len(data), size)]
+                self.assertEqual(list(iter_items_streaming(chunks)), expected)
+
+    def test_items_are_yielded_when_closed(self):
+        html = ('<div class="goods-list-item"><div class="goods-list-title">A</div></div>'
+                '<div class="goods-list-item"><div class="goods-list-title">B')
+        items = iter_items_streaming([html])
+        self.assertEqual(next(items).title, "A")
+
+    def test_script_text_is_ignored(self):
+        html = ('<div class="goods-list-item"><div class="goods-list-title">A'
+                '<script>var x = "<b>";</script></div></div>')
+        self.assertEqual([item.title for item in iter_items_streaming([html])],
+                         [item.title for item in parse_items_bs4(html)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import contextlib
+import io
+import os
+import random
+import unittest
+
+from selenium.common import NoSuchWindowException
+
+from utils.dd_utils import (
+    DD373Page,
+    DD373Product,
+    DD373SearchUrl,
+    FilterParams,
+    ListingFingerprints,
+    fetch_dd373_pages_in_tabs,
+    fingerprint_listing_region,
+    select_best_offers,
+)
+from utils.offer_batch import OfferBatch
+
+LISTING_PAGE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark", "corpus", "new_layout.html"
+)
+SEARCH_URL = "https://www.dd373.com/s-9fv09v-5tgdjq-55ns9v-0-0-0-3xb9qq-0-0-0-0-0-1-0-3-0.html"
+
+
+class SearchUrlTest(unittest.TestCase):
+
+    def test_parse(self):
+        search = DD373SearchUrl.parse(SEARCH_URL)
+        self.assertEqual(search.base, "https://www.dd373.com/s-")
+        self.assertEqual(search.page, 1)
+        self.assertTrue(search.is_price_sorted)
+
+    def test_with_page_keeps_other_segments_and_query(self):
+        search = DD373SearchUrl.parse(SEARCH_URL + "?ref=1")
+        self.assertEqual(
+            search.with_page(3),
+            "https://www.dd373.com/s-9fv09v-5tgdjq-55ns9v-0-0-0-3xb9qq-0-0-0-0-0-3-0-3-0.html?ref=1",
+        )
+        self.assertEqual(DD373SearchUrl.parse(search.with_page(3)).page, 3)
+
+    def test_not_price_sorted(self):
+        search = DD373SearchUrl.parse(SEARCH_URL.replace("-1-0-3-0.html", "-1-0-1-0.html"))
+        self.assertFalse(search.is_price_sorted)
+
+    def test_rejects_other_urls(self):
+        for url in ("https://www.dd373.com/detail-63B752AC06.html",
+                    "https://www.dd373.com/s-9fv09v.html",
+                    "https://www.dd373.com/s-9fv09v-x-0-3-0.html",
+                    ""):
+            with self.subTest(url=url):
+                self.assertIsNone(DD373SearchUrl.parse(url))
+
+
+def _offers(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    offers = []
+    for index in range(count):
+        price = rng.choice((1.5, 2.0, 2.5, 3.0))
+        offer = DD373Product(
+            title=f"offer {index}",
+            pack_price=price,
+            pack_stock=rng.randint(0, 50),
+            exchange_rate_2=rng.choice(("", "1钻=0.5元", "1钻=0.4元")),
+            credit_rating=rng.randint(1, 15),
+        )
+        offer.normalize()
+        offers.append(offer)
+    return offers
+
+
+class BestOfferTest(unittest.TestCase):
+
+    def test_batch_matches_python_selection(self):
+        for seed in range(20):
+            offers = _offers(200, seed)
+            batch = OfferBatch.from_products(offers)
+            for stock_min, level_min in ((0, 0), (10, 5), (45, 14)):
+                filter_params = FilterParams()
+                filter_params.stock_min = stock_min
+                filter_params.level_min = level_min
+                with self.subTest(seed=seed, stock_min=stock_min, level_min=level_min):
+                    expected = select_best_offers(offers, filter_params, k=3)
+                    self.assertIs(batch.best(filter_params), expected[0] if expected else None)
+                    self.assertEqual([offers[i] for i in batch.top_k(batch.mask(filter_params), 3)], expected)
+
+    def test_ties_go_to_lower_rate_then_earlier_offer(self):
+        offers = _offers(0, 0)
+        for title, rate in (("a", "1钻=0.5元"), ("b", "1钻=0.4元"), ("c", "1钻=0.4元")):
+            offer = DD373Product(title=title, pack_price=1.0, pack_stock=5, exchange_rate_2=rate)
+            offer.normalize()
+            offers.append(offer)
+        self.assertEqual([o.title for o in select_best_offers(offers, FilterParams(), k=3)], ["b", "c", "a"])
+
+
+class NormalizationErrorsTest(unittest.TestCase):
+
+    def test_malformed_exchange_rate(self):
+        offer = DD373Product(title="100个神圣石=10元", pack_price=10.0, exchange_rate_1="1元=10个",
+                             exchange_rate_2="1个=abc元")
+        offer.normalize()
+        self.assertEqual(offer.units_per_yuan, 10.0)
+        self.assertIsNone(offer.yuan_per_unit)
+        self.assertEqual(offer.normalization_errors, ("exchange_rate_2 '1个=abc元' has no number",))
+
+    def test_title_without_quantity(self):
+        offer = DD373Product(title="神圣石=100元", pack_price=100.0, pack_stock=2,
+                             exchange_rate_1="1元=1个", exchange_rate_2="1个=1元")
+        offer.normalize()
+        self.assertEqual((offer.pack_quantity, offer.stock, offer.price), (1, 2, 100.0))
+        self.assertEqual(offer.normalization_errors, ("no pack quantity in title '神圣石=100元'",))
+
+    def test_errors_are_reported_per_page(self):
+        page = DD373Page(url=SEARCH_URL, html=(
+            '<div class="goods-list-item"><a class="goods-list-title">神圣石=100元</a>'
+            '<div class="goods-price"><span>100</span></div></div>'
+        ))
+        fingerprints = ListingFingerprints()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            listings = fingerprints.parse(page)
+            fingerprints.parse(page)
+        self.assertEqual(len(listings), 1)
+        self.assertEqual(fingerprints.offers_with_errors, 1)
+        self.assertEqual(output.getvalue().count(SEARCH_URL), 1)
+        self.assertIn("no pack quantity", output.getvalue())
+        self.assertIn("1 parsed offers with unreadable fields", fingerprints.summary())
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        with open(LISTING_PAGE, encoding="utf-8") as f:
+            self.html = f.read()
+
+    def test_head_changes_keep_fingerprint(self):
+        # The <head> styles .goods-list-item and carries a page config that changes between loads
+        changed = self.html.replace('"gameId": "9fv09v"', '"gameId": "changed"')
+        self.assertNotEqual(changed, self.html)
+        self.assertLess(self.html.find("goods-list-item"), self.html.find("<body"))
+        self.assertEqual(fingerprint_listing_region(changed), fingerprint_listing_region(self.html))
+
+    def test_item_changes_alter_fingerprint(self):
+        # Price of the first and of the last item
+        for position in (self.html.index('class="goods-price'), self.html.rindex('class="goods-price')):
+            with self.subTest(position=position):
+                start = self.html.index(">", position) + 1
+                changed = self.html[:start] + "9" + self.html[start:]
+                self.assertNotEqual(fingerprint_listing_region(changed), fingerprint_listing_region(self.html))
+
+    def test_page_without_items(self):
+        self.assertEqual(fingerprint_listing_region("<style>.goods-list-item{}</style>"),
+                         fingerprint_listing_region(""))
+
+
+class _TabDriver:
+    """
+    Windows of a browser as WebDriver exposes them: closing a tab leaves the
+    session on a window that no longer exists, and every page is ready at once.
+    """
+
+    def __init__(self):
+        self.windows = {"main": "about:blank"}
+        self.current_window_handle = "main"
+        self.opened = 0
+        self.switch_to = self
+
+    # driver.switch_to is the driver itself
+    def window(self, handle):
+        if handle not in self.windows:
+            raise NoSuchWindowException(handle)
+        self.current_window_handle = handle
+
+    def new_window(self, kind):
+        self._check_current()
+        self.opened += 1
+        self.current_window_handle = f"tab{self.opened}"
+        self.windows[self.current_window_handle] = "about:blank"
+
+    def _check_current(self):
+        if self.current_window_handle not in self.windows:
+            raise NoSuchWindowException(self.current_window_handle)
+
+    def close(self):
+        self._check_current()
+        del self.windows[self.current_window_handle]
+
+    @property
+    def current_url(self):
+        self._check_current()
+        return self.windows[self.current_window_handle]
+
+    @property
+    def page_source(self):
+        return f"<html>{self.current_url}</html>"
+
+    def execute_script(self, script, *args):
+        self._check_current()
+        if script.startswith("window.location.href"):
+            self.windows[self.current_window_handle] = args[0]
+            return None
+        if script.startswith("return !!("):
+            return True
+        return [0, 0.0]
+
+
+class TabFetchTest(unittest.TestCase):
+
+    def test_more_urls_than_tabs(self):
+        urls = [f"https://www.dd373.com/s-{page}-0-1-0-3-0.html" for page in range(5)]
+        driver = _TabDriver()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = fetch_dd373_pages_in_tabs(urls, driver, max_tabs=2)
+        self.assertEqual(sorted(results), sorted(urls))
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotIsInstance(results[url], Exception)
+                self.assertEqual(results[url].html, f"<html>{url}</html>")
+        self.assertEqual(list(driver.windows), ["main"])
+        self.assertEqual(driver.current_window_handle, "main")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from utils.dd_parsers import PARSER_BACKENDS
+from utils.dd_utils import parse_dd373_listings
+from utils.extraction_plan import ExtractionPlan, FIELD_SPECS, LAYOUT_VARIANTS, LayoutVariant
+
+
+def _item(body: str) -> str:
+    return f'<div class="goods-list-item">{body}</div>'
+
+
+class LayoutVariantsTest(unittest.TestCase):
+
+    def test_declared_priority_wins_over_earlier_item_layout(self):
+        # The first item only has the .kucun span, the second one also the reputation text
+        html = (_item('<div class="kucun"><span>4</span></div>')
+                + _item('<div class="game-reputation">库存：7</div><div class="kucun"><span>3</span></div>'))
+        for backend in PARSER_BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual([p.pack_stock for p in parse_dd373_listings(html, backend=backend)], [4, 7])
+
+    def test_kucun_rates_win_over_width233(self):
+        # The first item has an empty .kucun, so its rates come from .width233
+        html = (_item('<div class="kucun"></div><div class="width233"><p>1元=2钻</p><p>1钻=0.5元</p></div>')
+                + _item('<div class="kucun"><p>1元=4钻</p><p>1钻=0.25元</p></div>'
+                        '<div class="width233"><p>1元=2钻</p><p>1钻=0.5元</p></div>'))
+        for backend in PARSER_BACKENDS:
+            with self.subTest(backend=backend):
+                rates = [p.exchange_rate_2 for p in parse_dd373_listings(html, backend=backend)]
+                self.assertEqual(rates, ["1钻=0.5元", "1钻=0.25元"])
+
+    def test_variant_of_unknown_field_is_rejected(self):
+        variants = dict(LAYOUT_VARIANTS)
+        variants["stock"] = variants["stock"] + (LayoutVariant("missing", "no_such_field", r"(\d+)"),)
+        with self.assertRaises(ValueError):
+            ExtractionPlan(FIELD_SPECS, variants)
+
+
+if __name__ == "__main__":
+    unittest.main()
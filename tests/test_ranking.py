@@ -0,0 +1,129 @@
+import random
+import unittest
+from dataclasses import dataclass
+from typing import Optional
+
+from model.ranking import VECTORIZE_MIN_OFFERS, OfferRanker, Predicate
+
+
+@dataclass
+class _Delivery:
+    value: int
+
+
+@dataclass
+class _Offer:
+    name: str
+    price: Optional[float]
+    stock: Optional[int] = 10
+    delivery: _Delivery = None
+
+    def __post_init__(self):
+        self.delivery = self.delivery or _Delivery(1)
+
+
+def _random_offers(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        _Offer(f"seller{rng.randint(0, 20)}", rng.choice((1.0, 1.5, 2.0, 2.5)), rng.randint(0, 100),
+               _Delivery(rng.randint(0, 48)))
+        for _ in range(count)
+    ]
+
+
+class PredicateTest(unittest.TestCase):
+
+    def test_operators(self):
+        offer = _Offer("a", 2.0, stock=10)
+        cases = {
+            ("stock", "lt", 11): True, ("stock", "lt", 10): False,
+            ("stock", "le", 10): True, ("stock", "le", 9): False,
+            ("stock", "gt", 9): True, ("stock", "gt", 10): False,
+            ("stock", "ge", 10): True, ("stock", "ge", 11): False,
+            ("stock", "eq", 10): True, ("stock", "eq", 11): False,
+            ("name", "in", frozenset({"a", "b"})): True, ("name", "in", frozenset({"b"})): False,
+            ("name", "not_in", frozenset({"b"})): True, ("name", "not_in", frozenset({"a"})): False,
+        }
+        for (field, op, value), expected in cases.items():
+            with self.subTest(field=field, op=op, value=value):
+                self.assertIs(Predicate(field, op, value).compile()(offer), expected)
+
+    def test_unknown_operator(self):
+        with self.assertRaises(ValueError):
+            Predicate("stock", "between", (1, 2))
+
+    def test_dotted_field(self):
+        check = Predicate("delivery.value", "le", 2).compile()
+        self.assertTrue(check(_Offer("a", 1.0, delivery=_Delivery(2))))
+        self.assertFalse(check(_Offer("a", 1.0, delivery=_Delivery(3))))
+
+
+class OfferRankerTest(unittest.TestCase):
+
+    def test_best_filters_and_ranks(self):
+        offers = [_Offer("a", 3.0), _Offer("blocked", 1.0), _Offer("b", 2.0, stock=1), _Offer("c", 2.5)]
+        ranker = OfferRanker("price", (Predicate("name", "not_in", {"blocked"}), Predicate("stock", "ge", 5)))
+        self.assertEqual(ranker.best(offers).name, "c")
+        self.assertEqual([o.name for o in ranker.filter(offers)], ["a", "c"])
+        self.assertIsNone(ranker.best([]))
+        with self.assertRaises(IndexError):
+            ranker.min([_Offer("blocked", 1.0)])
+
+    def test_ties_go_to_earliest_offer(self):
+        offers = [_Offer("a", 2.0), _Offer("b", 1.0), _Offer("c", 1.0)]
+        ranker = OfferRanker("price")
+        self.assertEqual(ranker.best(offers).name, "b")
+        self.assertEqual([o.name for o in ranker.top_k(offers, 3)], ["b", "c", "a"])
+
+    def test_good_enough_stops_early(self):
+        read = []
+
+        def offers():
+            for offer in (_Offer("a", 3.0), _Offer("b", 1.0), _Offer("c", 0.5)):
+                read.append(offer.name)
+                yield offer
+
+        self.assertEqual(OfferRanker("price").best(offers(), good_enough=1.0).name, "b")
+        self.assertEqual(read, ["a", "b"])
+
+    def test_top_k(self):
+        offers = _random_offers(50, 1)
+        ranker = OfferRanker("price", (Predicate("stock", "ge", 30),))
+        expected = sorted((o for o in offers if o.stock >= 30), key=lambda o: o.price)[:5]
+        self.assertEqual(ranker.top_k(offers, 5), expected)
+        self.assertEqual(ranker.top_k(offers, 0), [])
+
+    def test_vectorized_matches_scalar(self):
+        predicates = (
+            Predicate("name", "not_in", {"seller3", "seller7"}),
+            Predicate("stock", "ge", 20),
+            Predicate("delivery.value", "le", 24),
+        )
+        ranker = OfferRanker("price", predicates)
+        for seed in range(3):
+            offers = _random_offers(VECTORIZE_MIN_OFFERS + 100, seed)
+            with self.subTest(seed=seed):
+                # A generator is not a sequence, so it takes the scalar path
+                self.assertIs(ranker.best(offers), ranker.best(iter(offers)))
+                self.assertEqual(ranker.top_k(offers, 10), ranker.top_k(iter(offers), 10))
+
+    def test_missing_key_is_rejected_on_both_paths(self):
+        for missing in (None, float("nan")):
+            for count in (11, VECTORIZE_MIN_OFFERS):
+                offers = [_Offer("a", 5.0) for _ in range(count - 1)] + [_Offer("b", missing)]
+                with self.subTest(missing=missing, count=count):
+                    with self.assertRaises(TypeError):
+                        OfferRanker("price").best(offers)
+                    with self.assertRaises(TypeError):
+                        OfferRanker("price").top_k(offers, 3)
+
+    def test_missing_predicate_field_is_rejected_on_both_paths(self):
+        for count in (11, VECTORIZE_MIN_OFFERS):
+            offers = [_Offer("a", 5.0) for _ in range(count - 1)] + [_Offer("b", 1.0, stock=None)]
+            with self.subTest(count=count):
+                with self.assertRaises(TypeError):
+                    OfferRanker("price", (Predicate("stock", "ge", 1),)).best(offers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,27 @@
 import os
 
-from utils.google_api import StockManager
+
+def get_env_int(name: str, default: int) -> int:
+    """Integer setting from the environment, default when unset or invalid."""
+    try:
+        return int(os.getenv(name))
+    except Exception:
+        return default
+
+
+def get_env_float(name: str, default: float) -> float:
+    """Number setting from the environment, default when unset or invalid."""
+    try:
+        return float(os.getenv(name))
+    except Exception:
+        return default
 
 
 def getCNYRate() -> float:
+    # Imported here: the Google API client is slow to import and the env
+    # helpers above are used by modules that do not need it
+    from utils.google_api import StockManager
+
     try:
         sheet_manager = StockManager(os.getenv("CNY_RATE_SPREADSHEET_ID"))
         cell_value = sheet_manager.get_cell_float_value(f"'{os.getenv('CNY_RATE_SHEET_NAME')}'!{os.getenv('CNY_RATE_CELL')}")
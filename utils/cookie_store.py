@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+import constants
+
+# Session cookies (acw_tc, ...) have no expiry, keep them this long once saved
+SESSION_COOKIE_TTL = 30 * 60
+
+_lock = threading.Lock()
+
+
+def is_persistent_profile_enabled() -> bool:
+    return (os.getenv("DD_PERSIST_PROFILE") or "").strip().lower() in ("1", "true", "yes")
+
+
+def get_profile_dir(name: str) -> str:
+    return os.path.abspath(os.path.join(constants.USER_DATA_PATH, "chrome_profiles", name))
+
+
+def load_cookies() -> List[Dict[str, Any]]:
+    """Saved cookies that have not expired yet."""
+    try:
+        with open(constants.COOKIE_STORE_PATH, encoding="utf-8") as f:
+            cookies = json.load(f)
+    except (OSError, ValueError):
+        return []
+    now = time.time()
+    return [cookie for cookie in cookies if cookie.get("expiry", 0) > now]
+
+
+def save_cookies(driver: WebDriver) -> None:
+    """Merge the driver's cookies into the store, keyed by name, domain and path."""
+    now = time.time()
+    try:
+        driver_cookies = driver.get_cookies()
+    except Exception as e:
+        print(f"Cannot read driver cookies: {e}")
+        return
+
+    with _lock:
+        stored = {(c["name"], c.get("domain"), c.get("path")): c for c in load_cookies()}
+        changed = False
+        for cookie in driver_cookies:
+            key = (cookie["name"], cookie.get("domain"), cookie.get("path"))
+            cookie = dict(cookie)
+            if "expiry" not in cookie:
+                old = stored.get(key)
+                same_value = old is not None and old.get("value") == cookie.get("value")
+                cookie["expiry"] = old["expiry"] if same_value else int(now + SESSION_COOKIE_TTL)
+            if stored.get(key) != cookie:
+                stored[key] = cookie
+                changed = True
+        if not changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(constants.COOKIE_STORE_PATH), exist_ok=True)
+            with open(constants.COOKIE_STORE_PATH, "w", encoding="utf-8") as f:
+                json.dump(list(stored.values()), f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Cannot save cookies: {e}")
+
+
+def preload_cookies(driver: WebDriver) -> int:
+    """
+    Set the saved, still valid cookies in the browser before the first page
+    is loaded, so a warm restart does not have to pass the challenge again.
+
+    Returns:
+        Number of cookies loaded
+    """
+    cookies = [
+        {
+            "name": cookie["name"],
+            "value": cookie["value"],
+            "domain": cookie.get("domain", ""),
+            "path": cookie.get("path", "/"),
+            "secure": cookie.get("secure", False),
+            "httpOnly": cookie.get("httpOnly", False),
+            "expires": cookie["expiry"],
+        }
+        for cookie in load_cookies()
+    ]
+    if not cookies:
+        return 0
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+    except Exception as e:
+        print(f"Cannot preload cookies: {e}")
+        return 0
+    print(f"Preloaded {len(cookies)} saved cookies")
+    return len(cookies)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Callable, Dict, Generic, List, TypeVar, Union
+from urllib.parse import urlparse
+
+import constants
+from utils.common_utils import get_env_float, get_env_int
+
+T = TypeVar("T")
+
+
+class HostLimiter:
+    """
+    Caps in-flight requests per host and spaces request starts to the same host
+    by at least min_interval seconds. Other hosts are not slowed down.
+    """
+
+    def __init__(self, max_in_flight: int = 4, min_interval: float = 0.5):
+        self.max_in_flight = max(1, max_in_flight)
+        self.min_interval = max(0.0, min_interval)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_start: Dict[str, float] = {}
+
+    async def acquire(self, host: str) -> None:
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.max_in_flight))
+        await semaphore.acquire()
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._last_start.get(host, 0.0) + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_start[host] = time.monotonic()
+
+    def release(self, host: str) -> None:
+        self._semaphores[host].release()
+
+
+class CrawlEngine(Generic[T]):
+    """
+    Runs a blocking fetch function for many urls at once on an asyncio loop,
+    within the per-host limits. Each fetch gets a deadline timeout seconds after
+    its start, fetch(url, deadline) with deadline in time.monotonic() time, and
+    bounds its own requests with it: a thread cannot be cancelled, so waiting on
+    it with a timeout would leave it running.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, float], T],
+        max_in_flight_per_host: int | None = None,
+        min_interval_per_host: float | None = None,
+        timeout: float = constants.TIMEOUT,
+    ):
+        self.fetch = fetch
+        self.max_in_flight_per_host = max_in_flight_per_host or get_env_int("DD_HOST_CONCURRENCY", 4)
+        self.min_interval_per_host = min_interval_per_host \
+            if min_interval_per_host is not None else get_env_float("DD_HOST_MIN_INTERVAL", 0.5)
+        self.timeout = timeout
+
+    async def _fetch_one(self, limiter: HostLimiter, url: str) -> T:
+        host = urlparse(url).hostname or ""
+        await limiter.acquire(host)
+        try:
+            return await asyncio.to_thread(self.fetch, url, time.monotonic() + self.timeout)
+        finally:
+            limiter.release(host)
+
+    async def fetch_all(self, urls: List[str]) -> Dict[str, Union[T, Exception]]:
+        """Fetch every url, a failed url maps to its exception."""
+        limiter = HostLimiter(self.max_in_flight_per_host, self.min_interval_per_host)
+        unique_urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(
+            *(self._fetch_one(limiter, url) for url in unique_urls), return_exceptions=True
+        )
+        return dict(zip(unique_urls, results))
+
+    def run(self, urls: List[str]) -> Dict[str, Union[T, Exception]]:
+        """Synchronous facade of fetch_all for non-async callers."""
+        return asyncio.run(self.fetch_all(urls))
@@ -0,0 +1,232 @@
+import re
+import time
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+import constants
+from utils.exceptions import DDChallengeError, DDCrawlerError
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+}
+
+CHALLENGE_COOKIE = "acw_sc__v2"
+
+# Constants of the acw_sc__v2 challenge script (unsbox permutation + hexXor key)
+_ACW_POS_LIST = [
+    15, 35, 29, 24, 33, 16, 1, 38, 10, 9, 19, 31, 40, 27, 22, 23, 25, 13, 6, 11,
+    39, 18, 20, 8, 14, 21, 32, 26, 2, 30, 7, 4, 17, 5, 3, 28, 34, 37, 12, 36,
+]
+_ACW_MASK = "3000176000856006061501533003690027800375"
+_ARG1_RE = re.compile(r"arg1\s*=\s*['\"]([0-9A-Fa-f]+)['\"]")
+
+# A challenge page is a few KB: a body longer than this is a listing page
+_CHALLENGE_PEEK_BYTES = 16 * 1024
+_STREAM_CHUNK_BYTES = 16 * 1024
+
+_session: Optional[requests.Session] = None
+
+
+def get_http_session() -> requests.Session:
+    """
+    Shared keep-alive session with a connection pool, created on first use.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(HEADERS)
+        _session = session
+    return _session
+
+
+def is_challenge_page(html: str) -> bool:
+    return CHALLENGE_COOKIE in html
+
+
+def find_challenge_arg1(html: str) -> Optional[str]:
+    match = _ARG1_RE.search(html)
+    return match.group(1) if match else None
+
+
+def solve_acw_sc_v2(arg1: str) -> str:
+    """
+    Compute the acw_sc__v2 cookie value from the arg1 of the challenge script.
+
+    Python port of the script's unsbox/hexXor steps, so no JS runtime is needed.
+    """
+    unboxed = [""] * len(_ACW_POS_LIST)
+    for i, char in enumerate(arg1):
+        for j, pos in enumerate(_ACW_POS_LIST):
+            if pos == i + 1:
+                unboxed[j] = char
+    arg2 = "".join(unboxed)
+
+    result = []
+    for i in range(0, min(len(arg2), len(_ACW_MASK)), 2):
+        xored = int(arg2[i:i + 2], 16) ^ int(_ACW_MASK[i:i + 2], 16)
+        result.append(f"{xored:02x}")
+    return "".join(result)
+
+
+def _get(
+    session: requests.Session,
+    url: str,
+    timeout: float,
+    deadline: Optional[float] = None,
+    stream: bool = False,
+) -> requests.Response:
+    if deadline is not None:
+        # What is left of the fetch budget bounds the request timeout
+        timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            raise DDCrawlerError(f"Deadline exceeded for {url}")
+    response = session.get(url, timeout=timeout, stream=stream)
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        response.encoding = "utf-8"
+    return response
+
+
+def load_cookies_into_session(
+    cookies: List[Dict[str, Any]],
+    session: Optional[requests.Session] = None,
+) -> int:
+    """
+    Copy browser cookies (Selenium get_cookies() format) into the HTTP session.
+
+    Returns:
+        Number of cookies copied
+    """
+    session = session or get_http_session()
+    for cookie in cookies:
+        session.cookies.set(
+            cookie["name"], cookie["value"],
+            domain=cookie.get("domain", ""), path=cookie.get("path", "/"),
+        )
+    return len(cookies)
+
+
+def sync_cookies_from_driver(driver: WebDriver, session: Optional[requests.Session] = None) -> int:
+    """
+    Bridge a browser that passed the challenge to the HTTP session: its cookies
+    and User-Agent are copied, as the challenge cookie is checked against both.
+    """
+    session = session or get_http_session()
+    try:
+        cookies = driver.get_cookies()
+        user_agent = driver.execute_script("return navigator.userAgent;")
+    except Exception as e:
+        print(f"Cannot read cookies from driver: {e}")
+        return 0
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+    return load_cookies_into_session(cookies, session)
+
+
+def has_challenge_cookie(url: str, session: Optional[requests.Session] = None) -> bool:
+    session = session or get_http_session()
+    host = urlparse(url).hostname or ""
+    return any(
+        cookie.name == CHALLENGE_COOKIE and host.endswith(cookie.domain.lstrip("."))
+        for cookie in session.cookies
+    )
+
+
+def _set_challenge_cookie(session: requests.Session, url: str, html: str) -> None:
+    arg1 = find_challenge_arg1(html)
+    if not arg1:
+        raise DDChallengeError(f"Cannot find challenge arg1 for {url}")
+    try:
+        cookie = solve_acw_sc_v2(arg1)
+    except ValueError as e:
+        raise DDChallengeError(f"Cannot solve challenge for {url}: {e}") from e
+    session.cookies.set(CHALLENGE_COOKIE, cookie, domain=urlparse(url).hostname)
+
+
+def fetch_dd373_html(
+    url: str,
+    session: Optional[requests.Session] = None,
+    timeout: float = constants.TIMEOUT,
+    solve_challenge: bool = True,
+    deadline: Optional[float] = None,
+) -> str:
+    """
+    Fetch a DD373 page over plain HTTP, solving the acw_sc__v2 challenge if served.
+
+    Args:
+        solve_challenge: when False a challenge page raises DDChallengeError
+            right away, for callers relying on bridged browser cookies
+        deadline: time.monotonic() by which all the requests of the fetch,
+            challenge retries included, must be done
+
+    Raises:
+        DDChallengeError: the challenge could not be solved
+        DDCrawlerError: the page could not be loaded
+    """
+    session = session or get_http_session()
+    response = _get(session, url, timeout, deadline)
+
+    for _ in range(2 if solve_challenge else 0):
+        if not is_challenge_page(response.text):
+            break
+        _set_challenge_cookie(session, url, response.text)
+        response = _get(session, url, timeout, deadline)
+
+    if is_challenge_page(response.text):
+        raise DDChallengeError(f"Challenge still present after solving for {url}")
+
+    if response.status_code >= 400:
+        raise DDCrawlerError(f"HTTP {response.status_code} for {url}")
+    return response.text
+
+
+def stream_dd373_html(
+    url: str,
+    session: Optional[requests.Session] = None,
+    timeout: float = constants.TIMEOUT,
+    solve_challenge: bool = True,
+    deadline: Optional[float] = None,
+) -> Iterator[bytes]:
+    """
+    Same as fetch_dd373_html, but the body of the page is returned as the utf-8
+    chunks of response.iter_content, for iter_items_streaming. A response ending
+    within its first chunks is read whole and checked for the challenge, a
+    longer one is a listing page and is streamed without being held in memory.
+    Reading the chunks can still raise requests.RequestException.
+
+    Raises:
+        DDChallengeError: the challenge could not be solved
+        DDCrawlerError: the page could not be loaded
+    """
+    session = session or get_http_session()
+    attempts = 3 if solve_challenge else 1
+    for attempt in range(attempts):
+        response = _get(session, url, timeout, deadline, stream=True)
+        chunks = response.iter_content(chunk_size=_STREAM_CHUNK_BYTES)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= _CHALLENGE_PEEK_BYTES:
+                break
+        else:
+            # Whole body read: a small page, possibly the challenge
+            html = head.decode(response.encoding or "utf-8", errors="replace")
+            if is_challenge_page(html):
+                if attempt == attempts - 1:
+                    raise DDChallengeError(f"Challenge still present after solving for {url}")
+                _set_challenge_cookie(session, url, html)
+                continue
+        if response.status_code >= 400:
+            response.close()
+            raise DDCrawlerError(f"HTTP {response.status_code} for {url}")
+        return chain((head,), chunks)
+    raise DDChallengeError(f"Challenge still present after solving for {url}")
@@ -0,0 +1,420 @@
+import codecs
+import os
+import time
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from bs4 import BeautifulSoup, Tag
+from lxml import etree
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from utils.extraction_plan import EXTRACTION_PLAN
+
+
+class ItemFields(NamedTuple):
+    """
+    Raw texts and attributes of one div.goods-list-item, as read by any parser
+    backend; DD373Product.from_item_fields turns them into a product. None
+    means the element was not found.
+    """
+    title: Optional[str] = None  # .goods-list-title text
+    title_href: Optional[str] = None
+    servers: Optional[List[str]] = None  # .game-qufu-attr a texts
+    price: Optional[str] = None  # .goods-price text
+    reputation: Optional[str] = None  # .game-reputation text
+    reputation_bold: Optional[str] = None  # .game-reputation .bold text
+    kucun_span: Optional[str] = None  # .kucun span text
+    kucun_rates: Optional[List[str]] = None  # p texts of the first .kucun
+    width233_rates: Optional[List[str]] = None  # p texts of the first .width233
+    hearts: int = 0  # Icons in .game-reputation
+    diamonds: int = 0
+    crowns: int = 0
+    buy_href: Optional[str] = None  # .shop-btn-group a.im-buy-btn href
+
+
+def extract_item_fields(item: Tag) -> ItemFields:
+    """Fields of a BeautifulSoup item element, read through the extraction plan."""
+    get = EXTRACTION_PLAN.reader(item)
+    return ItemFields(*(get(name) for name in ItemFields._fields))
+
+
+def select_item_elements(html: Union[str, bytes]) -> List[Tag]:
+    return BeautifulSoup(html, 'html.parser').select('div.goods-list-item')
+
+
+# Same fields as extract_item_fields, read in the page: returns one array per
+# item in ItemFields order instead of the whole serialized DOM.
+EXTRACT_ITEMS_SCRIPT = """
+function text(el) {
+    if (!el) { return null; }
+    // Like bs4's .text: script and style contents are not text
+    var walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT, {
+        acceptNode: function (node) {
+            return /^(SCRIPT|STYLE|TEMPLATE)$/.test(node.parentNode.nodeName)
+                ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT;
+        }
+    });
+    var parts = [];
+    while (walker.nextNode()) { parts.push(walker.currentNode.nodeValue); }
+    return parts.join('');
+}
+function texts(root, selector) {
+    return root ? Array.prototype.map.call(root.querySelectorAll(selector), text) : null;
+}
+function count(root, selector) { return root ? root.querySelectorAll(selector).length : 0; }
+return Array.prototype.map.call(document.querySelectorAll('div.goods-list-item'), function (item) {
+    var title = item.querySelector('.goods-list-title');
+    var reputation = item.querySelector('.game-reputation');
+    var buy = item.querySelector('.shop-btn-group a.im-buy-btn');
+    return [
+        text(title),
+        title ? (title.getAttribute('href') || '') : null,
+        texts(item.querySelector('.game-qufu-attr'), 'a'),
+        text(item.querySelector('.goods-price')),
+        text(reputation),
+        reputation ? text(reputation.querySelector('.bold')) : null,
+        text(item.querySelector('.kucun span')),
+        texts(item.querySelector('.kucun'), 'p'),
+        texts(item.querySelector('.width233'), 'p'),
+        count(reputation, 'i.icon-heart'),
+        count(reputation, 'i.icon-bluediamond'),
+        count(reputation, 'i.icon-crown'),
+        buy ? (buy.getAttribute('href') || '') : null
+    ];
+});
+"""
+
+
+def extract_items_in_browser(driver: WebDriver) -> List[ItemFields]:
+    check_item_fields("script")
+    return [ItemFields(*values) for values in driver.execute_script(EXTRACT_ITEMS_SCRIPT)]
+
+
+def parse_items_bs4(html: Union[str, bytes]) -> List[ItemFields]:
+    return [extract_item_fields(item) for item in select_item_elements(html)]
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Compiled once; each mirrors a selector of extract_item_fields
+_XP_ITEMS = etree.XPath(f"//div[{_has_class('goods-list-item')}]")
+_XP_TITLE = etree.XPath(f"(.//*[{_has_class('goods-list-title')}])[1]")
+_XP_SERVER_INFO = etree.XPath(f"(.//*[{_has_class('game-qufu-attr')}])[1]")
+_XP_LINKS = etree.XPath(".//a")
+_XP_PRICE = etree.XPath(f"(.//*[{_has_class('goods-price')}])[1]")
+_XP_REPUTATION = etree.XPath(f"(.//*[{_has_class('game-reputation')}])[1]")
+_XP_BOLD = etree.XPath(f"(.//*[{_has_class('bold')}])[1]")
+_XP_KUCUN_SPAN = etree.XPath(f"(.//*[{_has_class('kucun')}]//span)[1]")
+_XP_KUCUN = etree.XPath(f"(.//*[{_has_class('kucun')}])[1]")
+_XP_WIDTH233 = etree.XPath(f"(.//*[{_has_class('width233')}])[1]")
+_XP_PARAGRAPHS = etree.XPath(".//p")
+_XP_HEARTS = etree.XPath(f"count(.//i[{_has_class('icon-heart')}])")
+_XP_DIAMONDS = etree.XPath(f"count(.//i[{_has_class('icon-bluediamond')}])")
+_XP_CROWNS = etree.XPath(f"count(.//i[{_has_class('icon-crown')}])")
+_XP_BUY_BUTTON = etree.XPath(f"(.//*[{_has_class('shop-btn-group')}]//a[{_has_class('im-buy-btn')}])[1]")
+# Like bs4's .text: script and style contents are not text
+_XP_TEXT = etree.XPath(".//text()[not(parent::script or parent::style or parent::template)]")
+
+_LXML_PARSER = etree.HTMLParser(encoding="utf-8")
+
+
+def _first(xpath: etree.XPath, element) -> Optional[etree._Element]:
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def _lxml_text(element) -> Optional[str]:
+    return "".join(_XP_TEXT(element)) if element is not None else None
+
+
+def parse_items_lxml(html: Union[str, bytes]) -> List[ItemFields]:
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    if not html.strip():
+        return []
+    root = etree.fromstring(html, _LXML_PARSER)
+    if root is None:
+        return []
+    items = []
+    for item in _XP_ITEMS(root):
+        title = _first(_XP_TITLE, item)
+        server_info = _first(_XP_SERVER_INFO, item)
+        reputation = _first(_XP_REPUTATION, item)
+        kucun = _first(_XP_KUCUN, item)
+        width233 = _first(_XP_WIDTH233, item)
+        buy_button = _first(_XP_BUY_BUTTON, item)
+        items.append(ItemFields(
+            title=_lxml_text(title),
+            title_href=title.get('href', '') if title is not None else None,
+            servers=[_lxml_text(a) for a in _XP_LINKS(server_info)] if server_info is not None else None,
+            price=_lxml_text(_first(_XP_PRICE, item)),
+            reputation=_lxml_text(reputation),
+            reputation_bold=_lxml_text(_first(_XP_BOLD, reputation)) if reputation is not None else None,
+            kucun_span=_lxml_text(_first(_XP_KUCUN_SPAN, item)),
+            kucun_rates=[_lxml_text(p) for p in _XP_PARAGRAPHS(kucun)] if kucun is not None else None,
+            width233_rates=[_lxml_text(p) for p in _XP_PARAGRAPHS(width233)] if width233 is not None else None,
+            hearts=int(_XP_HEARTS(reputation)) if reputation is not None else 0,
+            diamonds=int(_XP_DIAMONDS(reputation)) if reputation is not None else 0,
+            crowns=int(_XP_CROWNS(reputation)) if reputation is not None else 0,
+            buy_href=buy_button.get('href', '') if buy_button is not None else None,
+        ))
+    return items
+
+
+_VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+))
+_RAW_TEXT_ELEMENTS = frozenset(("script", "style", "template"))
+
+
+class _ItemBuilder:
+    """Fields of the item being streamed, filled as its elements open and close."""
+
+    def __init__(self):
+        self.title: Optional[List[str]] = None
+        self.title_href: Optional[str] = None
+        self.servers: Optional[List[List[str]]] = None
+        self.price: Optional[List[str]] = None
+        self.reputation: Optional[List[str]] = None
+        self.reputation_bold: Optional[List[str]] = None
+        self.kucun_span: Optional[List[str]] = None
+        self.kucun_rates: Optional[List[List[str]]] = None
+        self.width233_rates: Optional[List[List[str]]] = None
+        self.hearts = 0
+        self.diamonds = 0
+        self.crowns = 0
+        self.buy_href: Optional[str] = None
+
+    def build(self) -> ItemFields:
+        def join(parts):
+            return "".join(parts) if parts is not None else None
+
+        def join_all(parts_list):
+            return ["".join(parts) for parts in parts_list] if parts_list is not None else None
+
+        return ItemFields(
+            title=join(self.title), title_href=self.title_href, servers=join_all(self.servers),
+            price=join(self.price), reputation=join(self.reputation), reputation_bold=join(self.reputation_bold),
+            kucun_span=join(self.kucun_span), kucun_rates=join_all(self.kucun_rates),
+            width233_rates=join_all(self.width233_rates), hearts=self.hearts, diamonds=self.diamonds,
+            crowns=self.crowns, buy_href=self.buy_href,
+        )
+
+
+class StreamingItemParser(HTMLParser):
+    """
+    Incremental tokenizer that only tracks the goods-list-item subtrees: each
+    item is turned into ItemFields when its div closes, everything outside the
+    items is dropped as it streams by. Matches the bs4 selectors of
+    extract_item_fields; an end tag closes the most recent open element of the
+    same name, as BeautifulSoup does.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.completed: List[ItemFields] = []
+        self._item: Optional[_ItemBuilder] = None
+        # Open elements of the current item: (tag, classes, text buffers started here)
+        self._stack: List[tuple] = []
+        self._buffers: List[List[str]] = []
+        self._raw_text_depth = 0
+        self._reset_positions()
+
+    def _reset_positions(self) -> None:
+        # Stack positions of the first server info, reputation, kucun and width233 elements
+        self._server_info_depth = -1
+        self._reputation_depth = -1
+        self._kucun_depth = -1
+        self._width233_depth = -1
+
+    def _in(self, class_name: str) -> Optional[int]:
+        """Stack position of the innermost open element having the class."""
+        for position in range(len(self._stack) - 1, -1, -1):
+            if class_name in self._stack[position][1]:
+                return position
+        return None
+
+    def _open(self, tag: str, attrs: list, void: bool) -> None:
+        attributes = {name: value if value is not None else "" for name, value in attrs}
+        classes = frozenset(attributes.get("class", "").split())
+        if self._item is None:
+            if tag == "div" and "goods-list-item" in classes and not void:
+                self._item = _ItemBuilder()
+                self._stack = [(tag, classes, [])]
+            return
+
+        item = self._item
+        started: List[List[str]] = []
+
+        def capture() -> List[str]:
+            buffer: List[str] = []
+            started.append(buffer)
+            return buffer
+
+        if "goods-list-title" in classes and item.title is None:
+            item.title = capture()
+            item.title_href = attributes.get("href", "")
+        if "game-qufu-attr" in classes and item.servers is None:
+            item.servers = []
+            self._server_info_depth = len(self._stack)
+        elif tag == "a" and item.servers is not None and self._is_open_at(self._server_info_depth, "game-qufu-attr"):
+            item.servers.append(capture())
+        if "goods-price" in classes and item.price is None:
+            item.price = capture()
+        reputation_position = self._in("game-reputation")
+        if reputation_position is not None and reputation_position == self._reputation_depth:
+            if "bold" in classes and item.reputation_bold is None:
+                item.reputation_bold = capture()
+            if tag == "i":
+                item.hearts += "icon-heart" in classes
+                item.diamonds += "icon-bluediamond" in classes
+                item.crowns += "icon-crown" in classes
+        if "game-reputation" in classes and item.reputation is None:
+            item.reputation = capture()
+            self._reputation_depth = len(self._stack)
+        if tag == "span" and item.kucun_span is None and self._in("kucun") is not None:
+            item.kucun_span = capture()
+        if tag == "p":
+            if item.kucun_rates is not None and self._is_open_at(self._kucun_depth, "kucun"):
+                item.kucun_rates.append(capture())
+            if item.width233_rates is not None and self._is_open_at(self._width233_depth, "width233"):
+                item.width233_rates.append(capture())
+        if "kucun" in classes and item.kucun_rates is None:
+            item.kucun_rates = []
+            self._kucun_depth = len(self._stack)
+        if "width233" in classes and item.width233_rates is None:
+            item.width233_rates = []
+            self._width233_depth = len(self._stack)
+        if tag == "a" and "im-buy-btn" in classes and item.buy_href is None and self._in("shop-btn-group") is not None:
+            item.buy_href = attributes.get("href", "")
+
+        if void:
+            return
+        self._stack.append((tag, classes, started))
+        self._buffers.extend(started)
+        if tag in _RAW_TEXT_ELEMENTS:
+            self._raw_text_depth += 1
+
+    def _is_open_at(self, position: int, class_name: str) -> bool:
+        # The first element with the class, still open: only its descendants count
+        return 0 <= position < len(self._stack) and class_name in self._stack[position][1]
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs, tag in _VOID_ELEMENTS)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        if self._item is None:
+            return
+        for position in range(len(self._stack) - 1, -1, -1):
+            if self._stack[position][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > position:
+            closed_tag, _, started = self._stack.pop()
+            for buffer in started:
+                self._buffers.remove(buffer)
+            if closed_tag in _RAW_TEXT_ELEMENTS:
+                self._raw_text_depth -= 1
+        if not self._stack:
+            self.completed.append(self._item.build())
+            self._item = None
+            self._buffers = []
+            self._raw_text_depth = 0
+            self._reset_positions()
+
+    def handle_data(self, data):
+        if self._item is None or self._raw_text_depth:
+            return
+        for buffer in self._buffers:
+            buffer.append(data)
+
+
+def iter_items_streaming(chunks: Iterable[Union[str, bytes]]) -> Iterator[ItemFields]:
+    """
+    Yield the ItemFields of each goods-list-item as soon as it is closed in the
+    stream of html chunks, without building a document tree.
+    """
+    parser = StreamingItemParser()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        yield from parser.completed
+        parser.completed.clear()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.completed
+
+
+def parse_items_streaming(html: Union[str, bytes]) -> List[ItemFields]:
+    return list(iter_items_streaming([html]))
+
+
+PARSER_BACKENDS: Dict[str, Callable[[Union[str, bytes]], List[ItemFields]]] = {
+    "bs4": parse_items_bs4,
+    "lxml": parse_items_lxml,
+    "stream": parse_items_streaming,
+}
+
+
+def check_item_fields(backend: str) -> None:
+    """
+    The lxml, stream and browser backends hard-code the fields of ItemFields:
+    raise instead of silently returning None for a FieldSpec they do not read.
+    """
+    missing = [name for name in EXTRACTION_PLAN.fields if name not in ItemFields._fields]
+    if missing:
+        raise ValueError(f"Parser backend {backend} does not extract {', '.join(missing)}")
+
+
+def get_parser_backend(name: Optional[str] = None) -> Callable[[Union[str, bytes]], List[ItemFields]]:
+    name = (name or os.getenv("DD_PARSER") or "bs4").strip().lower()
+    if name not in PARSER_BACKENDS:
+        print(f"Unknown DD_PARSER '{name}', using bs4")
+        name = "bs4"
+    if name != "bs4":
+        check_item_fields(name)
+    return PARSER_BACKENDS[name]
+
+
+def compare_backends(html: Union[str, bytes]) -> Dict[str, bool]:
+    """Whether each backend yields the same products as bs4 for the page."""
+    from utils.dd_utils import DD373Product
+
+    def _products(backend):
+        return [DD373Product.from_item_fields(fields).to_dict() for fields in PARSER_BACKENDS[backend](html)]
+
+    expected = _products("bs4")
+    return {name: _products(name) == expected for name in PARSER_BACKENDS}
+
+
+def benchmark_backends(pages: List[bytes], rounds: int = 5) -> Dict[str, float]:
+    """Items parsed per second by each backend over the pages."""
+    results = {}
+    for name, parse_items in PARSER_BACKENDS.items():
+        count = 0
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                count += len(parse_items(page))
+        elapsed = time.perf_counter() - start
+        results[name] = count / elapsed if elapsed else 0.0
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    saved_pages = []
+    for path in sys.argv[1:]:
+        with open(path, "rb") as f:
+            saved_pages.append(f.read())
+        print(f"{path}: {compare_backends(saved_pages[-1])}")
+    for backend, items_per_sec in benchmark_backends(saved_pages).items():
+        print(f"{backend}: {items_per_sec:.0f} items/sec")
@@ -1,14 +1,73 @@
-import copy
+import hashlib
+import heapq
+import os
 import re
+import sys
+import threading
 import time
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any, Optional, Tuple
-
-from bs4 import BeautifulSoup, Tag
+from dataclasses import dataclass, fields as dataclass_fields
+from operator import attrgetter
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+
+import psutil
+import requests
+from bs4 import Tag
+from cachetools import LRUCache
 from selenium.common import TimeoutException
 from selenium.webdriver.chrome.webdriver import WebDriver
 
+import constants
 from model.sheet_model import DD
+from utils.cookie_store import is_persistent_profile_enabled, load_cookies, save_cookies
+from utils.crawl_engine import CrawlEngine
+from utils.dd_parsers import (
+    ItemFields,
+    extract_items_in_browser,
+    get_parser_backend,
+    iter_items_streaming,
+    parse_items_bs4,
+    parse_items_streaming,
+    select_item_elements,
+)
+from utils.dd_http import (
+    fetch_dd373_html,
+    has_challenge_cookie,
+    load_cookies_into_session,
+    stream_dd373_html,
+    sync_cookies_from_driver,
+)
+from utils.exceptions import DDCrawlerError
+from utils.extraction_plan import EXTRACTION_PLAN, FieldGetter
+from utils.listing_cache import get_listing_cache, normalize_url
+from utils.offer_batch import get_offer_batch
+from utils.page_readiness import get_readiness_strategy, wait_until_ready
+from utils.parse_pool import get_parse_stage
+from utils.selenium_utils import apply_resource_policy, record_page_load
+
+FETCH_MODE_SELENIUM = "selenium"
+FETCH_MODE_HTTP = "http"
+FETCH_MODE_BRIDGE = "bridge"  # HTTP with cookies of a browser that passed the challenge
+
+# A driver, or a provider called only when a page needs the browser (DriverPool.lazy_driver)
+DriverSource = Union[WebDriver, Callable[[], WebDriver], None]
+
+_NON_PRICE_CHARS_RE = re.compile(r'[^\d.]')
+_DIGITS_RE = re.compile(r'\d+')
+# Value of a rate after the '=', followed by its unit: "17.5439钻", "0.0570元"
+_RATE_VALUE_RE = re.compile(r'^\s*(\d+(?:\.\d*)?|\.\d+)\s*\D*$')
+
+
+def _parse_rate(name: str, rate: str, errors: List[str]) -> Optional[float]:
+    """Number of a "1元=17.5439钻" rate, None with an error when it cannot be read."""
+    parts = rate.split('=')
+    if len(parts) < 2:
+        errors.append(f"{name} missing" if not rate.strip() else f"{name} {rate!r} has no '='")
+        return None
+    match = _RATE_VALUE_RE.match(parts[1])
+    if not match:
+        errors.append(f"{name} {rate!r} has no number")
+        return None
+    return float(match.group(1))
 
 
 class FilterParams:
@@ -24,29 +83,55 @@ class FilterParams:
             return False
         return True
 
+    @classmethod
+    def from_dd(cls, dd: DD) -> "FilterParams":
+        filter_params = cls()
+        filter_params.stock_min = dd.DD_STOCKMIN
+        filter_params.level_min = dd.DD_LEVELMIN
+        return filter_params
 
-@dataclass
+
+@dataclass(slots=True)
 class DD373Product:
     title: str = ""
     url: str = ""
     product_id: str = ""
     server_info: str = ""
-    price: float = 0.0
-    stock: int = 0
+    price: float = 0.0  # Unit price: pack_price / pack_quantity
+    stock: int = 0  # Units: pack_stock * pack_quantity
     exchange_rate_1: str = ""  # 1元=17.5439钻
     exchange_rate_2: str = ""  # 1钻=0.0570元
     credit_rating: int = 0  # Trust level (1-15): 1-5 hearts, 6-10 diamonds, 11-15 crowns
     purchase_url: str = ""
+    # Set by normalize() from the parsed fields above
+    pack_price: float = 0.0  # Listed price
+    pack_stock: int = 0  # Listed stock
+    pack_quantity: int = 1  # Units per pack, from the title: "1000个神圣石 = 10元"
+    units_per_yuan: Optional[float] = None  # From exchange_rate_1
+    yuan_per_unit: Optional[float] = None  # From exchange_rate_2
+    normalization_errors: Tuple[str, ...] = ()
 
     @classmethod
     def from_html_element(cls, item: Tag, domain: str = "https://www.dd373.com") -> "DD373Product":
+        # Fields are only selected when needed, fallback layouts are not read when unused
+        return cls._from_fields(EXTRACTION_PLAN.reader(item), domain)
+
+    @classmethod
+    def from_item_fields(cls, fields: "ItemFields", domain: str = "https://www.dd373.com") -> "DD373Product":
+        # Every FieldSpec is an ItemFields field (checked by the backends), so a
+        # missing attribute is a bug and raises
+        return cls._from_fields(lambda name: getattr(fields, name), domain)
+
+    @classmethod
+    def _from_fields(cls, get: FieldGetter, domain: str) -> "DD373Product":
+        """Build a product from raw fields, resolving the layout variants of the plan."""
         product = cls()
 
         # 1. Title and URL
-        title_elem = item.select_one('.goods-list-title')
-        if title_elem:
-            product.title = title_elem.text.strip()
-            href = title_elem.get('href', '')
+        title = get("title")
+        if title is not None:
+            product.title = title.strip()
+            href = get("title_href") or ''
             if href and href.startswith('/'):
                 href = f"{domain}{href}"
             product.url = href
@@ -58,67 +143,32 @@ class DD373Product:
                     pass
 
         # 2. Server info
-        server_info = item.select_one('.game-qufu-attr')
-        if server_info:
-            servers = [a.text.strip() for a in server_info.select('a')]
+        servers = get("servers")
+        if servers is not None:
+            servers = [server.strip() for server in servers]
             product.server_info = '/'.join(servers) if servers else ''
 
         # 3. Price (Lấy tất cả số trong thẻ giá)
-        price_elem = item.select_one('.goods-price')
-        if price_elem:
+        price = get("price")
+        if price is not None:
             # Chỉ lấy số và dấu chấm (ví dụ: ￥103.10 -> 103.10)
             try:
-                product.price = float(re.sub(r'[^\d.]', '', price_elem.text))
+                product.pack_price = float(_NON_PRICE_CHARS_RE.sub('', price))
             except (ValueError, TypeError):
-                product.price = 0.0
-
-        # 4. STOCK (TỒN KHO) - CẢI TIẾN QUAN TRỌNG
-        # Thay vì tìm class .colorff5, ta tìm text "库存" hoặc "Stock" trong vùng chứa thông tin
-        # Cách này an toàn hơn nhiều.
-        reputation_div = item.select_one('.game-reputation')
-        if reputation_div:
-            # Regex tìm chuỗi kiểu: "库存： 7" hoặc "库存:7"
-            # \s* chấp nhận mọi khoảng trắng
-            stock_match = re.search(r'库存\s*[：:]\s*(\d+)', reputation_div.text)
-            if stock_match:
-                product.stock = int(stock_match.group(1))
-            else:
-                # Fallback: Thử tìm thẻ đậm (bold) nếu regex thất bại
-                bold_span = reputation_div.select_one('.bold')
-                if bold_span and bold_span.text.strip().isdigit():
-                    product.stock = int(bold_span.text.strip())
-
-        # Fallback cũ: Nếu vẫn chưa tìm ra stock, thử tìm trong .kucun (phòng khi web rollback)
-        if product.stock == 0:
-            stock_elem_old = item.select_one('.kucun span')
-            if stock_elem_old and stock_elem_old.text.strip().isdigit():
-                product.stock = int(stock_elem_old.text.strip())
-
-        # 5. Exchange rates (Tỷ lệ)
-        # Tìm trong .kucun, bất kể cấu trúc div lồng nhau thế nào
-        kucun_div = item.select_one('.kucun')
-        if kucun_div:
-            # Lấy tất cả thẻ p, vì text tỷ lệ luôn nằm trong p
-            ps = kucun_div.select('p')
-            if len(ps) >= 2:
-                product.exchange_rate_1 = ps[0].text.strip()
-                product.exchange_rate_2 = ps[1].text.strip()
-            # Fallback cho giao diện cũ (.width233)
-            elif not ps:
-                old_rate_div = item.select_one('.width233')
-                if old_rate_div:
-                    ps_old = old_rate_div.select('p')
-                    if len(ps_old) >= 2:
-                        product.exchange_rate_1 = ps_old[0].text.strip()
-                        product.exchange_rate_2 = ps_old[1].text.strip()
+                product.pack_price = 0.0
 
-        # 6. Credit rating
-        reputation = item.select_one('.game-reputation')
-        if reputation:
-            hearts = len(reputation.select('i.icon-heart'))
-            diamonds = len(reputation.select('i.icon-bluediamond'))
-            crowns = len(reputation.select('i.icon-crown'))
+        # 4. STOCK (TỒN KHO): "库存" in the reputation block, its bold number,
+        # or .kucun span on the old layout (see LAYOUT_VARIANTS)
+        product.pack_stock = EXTRACTION_PLAN.resolve("stock", get) or 0
+
+        # 5. Exchange rates (Tỷ lệ): p of .kucun, or .width233 on the old layout
+        rates = EXTRACTION_PLAN.resolve("exchange_rates", get)
+        if rates is not None:
+            product.exchange_rate_1, product.exchange_rate_2 = rates
 
+        # 6. Credit rating
+        if get("reputation") is not None:
+            hearts, diamonds, crowns = get("hearts"), get("diamonds"), get("crowns")
             if hearts > 0:
                 product.credit_rating = hearts
             elif diamonds > 0:
@@ -127,123 +177,652 @@ class DD373Product:
                 product.credit_rating = 10 + crowns
 
         # 7. Purchase URL
-        buy_btn = item.select_one('.shop-btn-group a.im-buy-btn')
-        if buy_btn:
-            href = buy_btn.get('href', '')
+        buy_href = get("buy_href")
+        if buy_href is not None:
+            href = buy_href
             if href and not href.startswith('http'):
                 href = f"https:{href}"
             product.purchase_url = href
 
-        # 8. Tính toán số lượng thực (Quantity & Unit Price)
+        product.intern_strings()
+        product.normalize()
+        return product
+
+    def intern_strings(self) -> None:
+        """
+        Share the server names, the few strings repeated across products.
+        Titles, urls and rates are mostly unique and interned strings are never
+        freed (immortal on Python 3.12), so they are left as they are.
+        """
+        self.server_info = sys.intern(self.server_info)
+
+    def normalize(self) -> None:
+        """
+        Compute the numeric fields once from the parsed ones: pack quantity,
+        unit price and stock, and both exchange rates. What cannot be read is
+        listed in normalization_errors and left None.
+        """
+        errors = []
+
+        # Tính toán số lượng thực (Quantity & Unit Price)
         # Logic: Title "1000 Divine = 100 tệ", Stock hiển thị 2 -> Tổng stock = 2000
         quantity = 1
-        if product.title and '=' in product.title:
-            try:
-                # Lấy phần text trước dấu =, ví dụ "1000个神圣石"
-                quantity_part = product.title.split('=')[0]
-                # Tìm số đầu tiên trong chuỗi này
-                match = re.search(r'\d+', quantity_part)
-                if match:
-                    quantity = int(match.group())
-                    # Nhân stock hiển thị với số lượng gói
-                    product.stock = quantity * product.stock
-            except (ValueError, TypeError, IndexError):
-                quantity = 1
-
-        # Tính giá đơn vị
+        if '=' in self.title:
+            # Số đầu tiên trước dấu =, ví dụ "1000个神圣石"
+            match = _DIGITS_RE.search(self.title.split('=')[0])
+            if match:
+                quantity = int(match.group())
+            else:
+                errors.append(f"no pack quantity in title {self.title!r}")
+        self.pack_quantity = quantity
+        self.stock = quantity * self.pack_stock
         if quantity > 0:
-            product.price = product.price / quantity
+            self.price = self.pack_price / quantity
+        else:
+            errors.append(f"pack quantity 0 in title {self.title!r}")
+            self.price = self.pack_price
 
+        self.units_per_yuan = _parse_rate("exchange_rate_1", self.exchange_rate_1, errors)
+        self.yuan_per_unit = _parse_rate("exchange_rate_2", self.exchange_rate_2, errors)
+        self.normalization_errors = tuple(errors)
+
+    def to_record(self) -> tuple:
+        """Field values in declaration order, no copy of them is made."""
+        return _product_values(self)
+
+    @classmethod
+    def from_record(cls, record: tuple) -> "DD373Product":
+        product = cls(*record)
+        product.intern_strings()
         return product
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert the product to a dictionary"""
-        return asdict(self)
+        return dict(zip(_PRODUCT_FIELDS, _product_values(self)))
+
+
+_PRODUCT_FIELDS = tuple(field.name for field in dataclass_fields(DD373Product))
+_product_values = attrgetter(*_PRODUCT_FIELDS)
+
+
+@dataclass
+class DD373Page:
+    url: str
+    html: str
+    source: str = FETCH_MODE_SELENIUM  # Which fetch engine served the page
+    wait_time: float = 0.0  # Seconds spent waiting for the page to be ready
+    items: Optional[List[ItemFields]] = None  # Extracted in the browser or streamed, instead of html
+
+
+def _is_script_extraction() -> bool:
+    return (os.getenv("DD_EXTRACT_MODE") or "").strip().lower() == "script"
+
+
+def _read_page(driver: WebDriver, url: str, wait_time: float) -> DD373Page:
+    """Read the ready page of the current window, as html or as extracted items."""
+    if _is_script_extraction():
+        return DD373Page(url=url, html="", source=FETCH_MODE_SELENIUM, wait_time=wait_time,
+                         items=extract_items_in_browser(driver))
+    return DD373Page(url=url, html=driver.page_source, source=FETCH_MODE_SELENIUM, wait_time=wait_time)
+
+
+def _get_fetch_mode() -> str:
+    mode = (os.getenv("DD_FETCH_MODE") or constants.DD_FETCH_MODE).strip().lower()
+    if mode not in (FETCH_MODE_SELENIUM, FETCH_MODE_HTTP, FETCH_MODE_BRIDGE):
+        print(f"Unknown DD_FETCH_MODE '{mode}', using {constants.DD_FETCH_MODE}")
+        return constants.DD_FETCH_MODE
+    return mode
+
+
+def _fetch_with_selenium(url: str, driver: WebDriver) -> DD373Page:
+    if driver is None:
+        raise DDCrawlerError(f"No driver available to load {url}")
+    driver.get(url)
+    wait_time = wait_until_ready(driver, url)
+    record_page_load(driver)
+    if is_persistent_profile_enabled():
+        save_cookies(driver)
+    return _read_page(driver, url, wait_time)
+
+
+_first_fetch_logged = False
+
+
+def _log_first_fetch() -> None:
+    global _first_fetch_logged
+    if _first_fetch_logged:
+        return
+    _first_fetch_logged = True
+    try:
+        started_at = psutil.Process().create_time()
+        print(f"First page fetched {time.time() - started_at:.2f}s after startup")
+    except psutil.Error:
+        pass
+
+
+def _fetch_http_page(url: str, solve_challenge: bool = True, deadline: Optional[float] = None) -> DD373Page:
+    """
+    With the stream parser the response chunks are fed to the streaming
+    tokenizer as they arrive: the page is kept as its items, the whole html is
+    never held in memory.
+    """
+    if get_parser_backend() is parse_items_streaming:
+        chunks = stream_dd373_html(url, solve_challenge=solve_challenge, deadline=deadline)
+        return DD373Page(url=url, html="", source=FETCH_MODE_HTTP, items=list(iter_items_streaming(chunks)))
+    html = fetch_dd373_html(url, solve_challenge=solve_challenge, deadline=deadline)
+    return DD373Page(url=url, html=html, source=FETCH_MODE_HTTP)
+
+
+def _fetch_with_bridge(url: str, deadline: Optional[float] = None) -> Optional[DD373Page]:
+    """HTTP fetch with bridged browser cookies, None when the browser is needed."""
+    if not has_challenge_cookie(url) and is_persistent_profile_enabled():
+        load_cookies_into_session(load_cookies())
+    if not has_challenge_cookie(url):
+        return None
+    try:
+        return _fetch_http_page(url, solve_challenge=False, deadline=deadline)
+    except (DDCrawlerError, requests.RequestException) as e:
+        print(f"Bridged HTTP fetch failed for {url}: {e}, using the browser")
+        return None
+
+
+def fetch_dd373_page_over_http(
+    url: str,
+    mode: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> Optional[DD373Page]:
+    """HTTP part of fetch_dd373_page, None when the page needs the browser."""
+    mode = mode or _get_fetch_mode()
+    if mode == FETCH_MODE_HTTP:
+        try:
+            return _fetch_http_page(url, deadline=deadline)
+        except (DDCrawlerError, requests.RequestException) as e:
+            print(f"HTTP fetch failed for {url}: {e}, falling back to Selenium")
+    elif mode == FETCH_MODE_BRIDGE:
+        return _fetch_with_bridge(url, deadline)
+    return None
+
+
+def _resolve_driver(driver: DriverSource) -> Optional[WebDriver]:
+    return driver() if callable(driver) else driver
+
+
+def fetch_dd373_page(url: str, driver: DriverSource) -> DD373Page:
+    """
+    Load the HTML of a DD373 page with the configured fetch engine.
+
+    In http mode the page is requested directly and the challenge is solved
+    locally. In bridge mode it is requested with the cookies of the last browser
+    fetch. Selenium is only used when those fail, a driver provider is only
+    called then.
+    """
+    mode = _get_fetch_mode()
+    page = fetch_dd373_page_over_http(url, mode)
+    if page is None:
+        driver = _resolve_driver(driver)
+        page = _fetch_with_selenium(url, driver)
+        if mode == FETCH_MODE_BRIDGE:
+            sync_cookies_from_driver(driver)
+    print(f"Served by {page.source}: {url}")
+    _log_first_fetch()
+    return page
+
+
+def parse_dd373_listings(
+    html: Union[str, bytes],
+    domain: str = constants.DD_DOMAIN,
+    backend: Optional[str] = None,
+) -> List[DD373Product]:
+    """
+    Parse every div.goods-list-item of a page with the DD_PARSER backend
+    (bs4 by default, lxml or stream).
+    """
+    parse_items = get_parser_backend(backend)
+    if parse_items is parse_items_bs4:
+        # Lazy fields: fallback layouts are only selected when the page needs them
+        return [DD373Product.from_html_element(item, domain) for item in select_item_elements(html)]
+    return [DD373Product.from_item_fields(fields, domain) for fields in parse_items(html)]
+
+
+_LISTING_REGION_END_MARKERS = ('class="pagination', "class='pagination", 'id="pagination', '<footer', 'class="footer')
+# Opening tag of an item; the class name alone also shows up in the <style> and scripts of <head>
+_ITEM_TAG_RE = re.compile(r'<div\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])goods-list-item(?![\w-])')
+
+
+def fingerprint_listing_region(html: str) -> str:
+    """
+    Hash of the part of the page holding the goods-list items: from the
+    opening tag of the first item up to the pagination/footer after the last
+    one, or the end of the page.
+    """
+    first_item = last_item = None
+    for last_item in _ITEM_TAG_RE.finditer(html):
+        first_item = first_item or last_item
+    if first_item is None:
+        region = ""
+    else:
+        end = len(html)
+        for marker in _LISTING_REGION_END_MARKERS:
+            position = html.find(marker, last_item.end())
+            if position != -1:
+                end = min(end, position)
+        region = html[first_item.start():end]
+    return hashlib.blake2b(region.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ListingFingerprints:
+    """
+    Last listing fingerprint and parsed listings per url. A page whose listing
+    region did not change gets back the very same listings object, unparsed.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self._pages: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.unchanged = 0
+        self.offers_with_errors = 0  # Parsed offers with a field normalize() could not read
+
+    def lookup(self, page: DD373Page) -> Tuple[str, Optional[List[DD373Product]]]:
+        """Fingerprint of the page, and its previous listings if it did not change."""
+        if page.items is not None:
+            fingerprint = hashlib.blake2b(repr(page.items).encode("utf-8"), digest_size=16).hexdigest()
+        else:
+            fingerprint = fingerprint_listing_region(page.html)
+        with self._lock:
+            previous = self._pages.get(normalize_url(page.url))
+            if previous is not None and previous[0] == fingerprint:
+                self.unchanged += 1
+                return fingerprint, previous[1]
+        return fingerprint, None
+
+    def remember(self, page: DD373Page, fingerprint: str, listings: List[DD373Product]) -> None:
+        errors = [product.normalization_errors for product in listings if product.normalization_errors]
+        with self._lock:
+            self.parsed += 1
+            self.offers_with_errors += len(errors)
+            self._pages[normalize_url(page.url)] = (fingerprint, listings)
+        if errors:
+            print(f"{len(errors)}/{len(listings)} offers of {page.url} not fully read, first: {errors[0][0]}")
+
+    def parse(self, page: DD373Page) -> List[DD373Product]:
+        fingerprint, listings = self.lookup(page)
+        if listings is not None:
+            return listings
+        domain = _get_domain(page.url)
+        if page.items is not None:
+            listings = [DD373Product.from_item_fields(fields, domain) for fields in page.items]
+        else:
+            listings = parse_dd373_listings(page.html, domain)
+        self.remember(page, fingerprint, listings)
+        return listings
+
+    def parse_many(self, pages: List[DD373Page]) -> Dict[str, Union[List[DD373Product], Exception]]:
+        """
+        Same as parse for each page, the changed html pages being parsed
+        together on the parse stage.
+        """
+        results: Dict[str, Union[List[DD373Product], Exception]] = {}
+        to_parse: Dict[str, Tuple[DD373Page, str]] = {}
+        for page in pages:
+            if page.items is not None:
+                results[page.url] = self.parse(page)
+                continue
+            fingerprint, listings = self.lookup(page)
+            if listings is not None:
+                results[page.url] = listings
+            else:
+                to_parse[page.url] = (page, fingerprint)
+
+        jobs = [(url, page.html.encode("utf-8"), _get_domain(url)) for url, (page, _) in to_parse.items()]
+        for url, records in get_parse_stage().parse_many(parse_dd373_records, jobs).items():
+            if isinstance(records, Exception):
+                results[url] = records
+                continue
+            page, fingerprint = to_parse[url]
+            results[url] = [DD373Product.from_record(record) for record in records]
+            self.remember(page, fingerprint, results[url])
+        return results
+
+    def summary(self) -> str:
+        total = self.parsed + self.unchanged
+        rate = self.unchanged / total * 100 if total else 0.0
+        return (
+            f"Listing fingerprints: {self.unchanged}/{total} pages unchanged, parse skipped {rate:.1f}%, "
+            f"{self.offers_with_errors} parsed offers with unreadable fields"
+        )
+
 
+listing_fingerprints = ListingFingerprints()
 
-def get_dd373_listings(url: str, driver: WebDriver) -> List[DD373Product]:
+
+def parse_dd373_page(page: DD373Page) -> List[DD373Product]:
+    return listing_fingerprints.parse(page)
+
+
+def parse_dd373_pages(pages: List[DD373Page]) -> Dict[str, Union[List[DD373Product], Exception]]:
+    return listing_fingerprints.parse_many(pages)
+
+
+def parse_dd373_records(html: str, domain: str) -> List[tuple]:
+    """parse_dd373_listings as plain tuples, cheap to send back from a parse worker."""
+    return [product.to_record() for product in parse_dd373_listings(html, domain)]
+
+
+def get_dd373_listings(url: str, driver: DriverSource) -> List[DD373Product]:
     """
     Scrapes product listings from DD373 website
 
     Args:
         url: The DD373 URL to scrape
+        driver: Selenium driver or driver provider, used unless the HTTP engine serves the page
 
     Returns:
-        A list of DD373Product objects
-        :param driver:
+        A list of DD373Product objects, from the listing cache while fresh
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    }
+    cache = get_listing_cache()
+    listings = cache.get(url)
+    if listings is None:
+        page = fetch_dd373_page(url, driver)
+        listings = parse_dd373_page(page)
+        cache.put(url, listings)
+    return listings
 
-    domain = url.split('/s-')[0] if '/s-' in url else 'https://www.dd373.com'
-    driver.get(url)
-    page_source = driver.page_source
-    timeout = 15
-    start_time = time.time()
-
-    while True:
-        current_page_source = driver.page_source
-        if "acw_sc__v2" not in current_page_source:
-            page_source = current_page_source
-            break
 
-        if time.time() - start_time > timeout:
-            raise TimeoutException("Timeout when loading page source")
-        time.sleep(0.5)
+def _get_domain(url: str) -> str:
+    return url.split('/s-')[0] if '/s-' in url else constants.DD_DOMAIN
 
-    soup = BeautifulSoup(page_source, 'html.parser')
 
-    # Find all product listings
-    goods_list_items = soup.select('div.goods-list-item')
+def fetch_dd373_pages_in_tabs(
+    urls: List[str],
+    driver: WebDriver,
+    max_tabs: int = 4,
+) -> Dict[str, Union[DD373Page, Exception]]:
+    """
+    Load several DD373 pages concurrently in tabs of a single browser.
 
-    # Create product objects from HTML elements
-    return [DD373Product.from_html_element(item, domain) for item in goods_list_items]
+    Navigations are started without waiting for them, then every open tab is
+    checked with its readiness strategy until the challenge clears, so the tabs
+    wait for the challenge in parallel. A failed or timed out url maps to the
+    exception instead.
+    """
+    results: Dict[str, Union[DD373Page, Exception]] = {}
+    pending = list(dict.fromkeys(urls))
+    open_tabs: Dict[str, Tuple[str, float]] = {}  # window handle -> (url, start time)
+    main_handle = driver.current_window_handle
+
+    try:
+        while pending or open_tabs:
+            while pending and len(open_tabs) < max(1, max_tabs):
+                url = pending.pop(0)
+                try:
+                    # New Window needs an open current window, the last checked tab may be closed
+                    driver.switch_to.window(main_handle)
+                    driver.switch_to.new_window('tab')
+                    apply_resource_policy(driver)
+                    driver.execute_script("window.location.href = arguments[0];", url)
+                    open_tabs[driver.current_window_handle] = (url, time.time())
+                except Exception as e:
+                    results[url] = e
+
+            for handle, (url, start_time) in list(open_tabs.items()):
+                try:
+                    driver.switch_to.window(handle)
+                    if driver.current_url.startswith(url.split('?')[0]) \
+                            and get_readiness_strategy(url).is_ready(driver):
+                        wait_time = time.time() - start_time
+                        print(f"Tab ready in {wait_time:.2f}s: {url}")
+                        record_page_load(driver)
+                        if is_persistent_profile_enabled():
+                            save_cookies(driver)
+                        results[url] = _read_page(driver, url, wait_time)
+                    if url not in results and time.time() - start_time > constants.TIMEOUT:
+                        results[url] = TimeoutException(f"Timeout when loading page source of {url}")
+                except Exception as e:
+                    results[url] = e
+                if url in results:
+                    del open_tabs[handle]
+                    try:
+                        driver.close()
+                    except Exception as e:
+                        print(f"Error closing tab: {e}")
+            time.sleep(0.5)
+    finally:
+        for handle in open_tabs:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception:
+                pass
+        driver.switch_to.window(main_handle)
 
+    return results
+
+
+def get_dd373_listings_multi(
+    urls: List[str],
+    driver: WebDriver,
+    max_tabs: int = 4,
+) -> Dict[str, Union[List[DD373Product], Exception]]:
+    """
+    Same result as get_dd373_listings for each url, loaded concurrently in tabs.
+    """
+    cache = get_listing_cache()
+    listings: Dict[str, Union[List[DD373Product], Exception]] = {}
+    for url in urls:
+        cached = cache.get(url)
+        if cached is not None:
+            listings[url] = cached
+    to_fetch = [url for url in urls if url not in listings]
+    pages = []
+    for url, page in fetch_dd373_pages_in_tabs(to_fetch, driver, max_tabs).items():
+        if isinstance(page, Exception):
+            listings[url] = page
+        else:
+            pages.append(page)
+    listings.update(_parse_and_cache(pages))
+    return listings
+
+
+def _parse_and_cache(pages: List[DD373Page]) -> Dict[str, Union[List[DD373Product], Exception]]:
+    parsed = parse_dd373_pages(pages)
+    cache = get_listing_cache()
+    for url, listings in parsed.items():
+        if not isinstance(listings, Exception):
+            cache.put(url, listings)
+    return parsed
+
+
+def is_http_fetch_mode() -> bool:
+    return _get_fetch_mode() in (FETCH_MODE_HTTP, FETCH_MODE_BRIDGE)
+
+
+def _fetch_dd373_page_over_http_or_raise(url: str, deadline: float) -> DD373Page:
+    page = fetch_dd373_page_over_http(url, deadline=deadline)
+    if page is None:
+        raise DDCrawlerError(f"{url} needs the browser")
+    print(f"Served by {page.source}: {url}")
+    return page
+
+
+def crawl_dd373_listings(urls: List[str]) -> Dict[str, Union[List[DD373Product], Exception]]:
+    """
+    Fetch the listings of many urls concurrently over HTTP, within the per-host
+    limits of CrawlEngine, then parse the pages together on the parse stage.
+    Urls that need the browser map to an exception and are left to
+    get_dd373_listings.
+    """
+    cache = get_listing_cache()
+    listings: Dict[str, Union[List[DD373Product], Exception]] = {}
+    for url in urls:
+        cached = cache.get(url)
+        if cached is not None:
+            listings[url] = cached
+    pages = []
+    for url, page in CrawlEngine(_fetch_dd373_page_over_http_or_raise).run(
+            [url for url in urls if url not in listings]).items():
+        if isinstance(page, Exception):
+            listings[url] = page
+        else:
+            pages.append(page)
+    listings.update(_parse_and_cache(pages))
+    return listings
 
-def _filter_valid_offer_item(listOffers: List[DD373Product], filterParams: FilterParams) -> List[DD373Product]:
-    # Make a copy of the list
-    offers_copy = copy.deepcopy(listOffers)
 
-    # Sort by exchange_rate_2
-    # sorted_offers = sorted(offers_copy, key=lambda x: float(x.exchange_rate_2.split('=')[1].replace('元', '').strip()))
+@dataclass
+class DD373SearchUrl:
+    """
+    A search url such as /s-9fv09v-...-0-0-1-0-3-0.html: dash separated
+    segments, of which the 4th from the end is the page number and the 2nd
+    from the end the sort field.
+    """
+    base: str  # Everything up to and including "/s-"
+    segments: List[str]
+    suffix: str = ""  # Query string after ".html"
+
+    PAGE_INDEX = -4
+    SORT_INDEX = -2
 
-    sorted_offers = sorted(
-        offers_copy,
-        key=lambda x: float(x.exchange_rate_2.split('=')[1].replace('元', '').strip())
-        if '=' in x.exchange_rate_2 and len(x.exchange_rate_2.split('=')) > 1
-        else float('inf')
+    _URL_RE = re.compile(r'^(?P<base>.*/s-)(?P<segments>[0-9A-Za-z]+(?:-[0-9A-Za-z]+)*)\.html(?P<suffix>.*)$')
+
+    @classmethod
+    def parse(cls, url: str) -> Optional["DD373SearchUrl"]:
+        match = cls._URL_RE.match(url.strip())
+        if not match:
+            return None
+        segments = match.group('segments').split('-')
+        if len(segments) < -cls.PAGE_INDEX or not segments[cls.PAGE_INDEX].isdigit():
+            return None
+        return cls(base=match.group('base'), segments=segments, suffix=match.group('suffix'))
+
+    @property
+    def page(self) -> int:
+        return int(self.segments[self.PAGE_INDEX])
+
+    @property
+    def is_price_sorted(self) -> bool:
+        return self.segments[self.SORT_INDEX] in constants.DD_PRICE_SORT_VALUES
+
+    def with_page(self, page: int) -> str:
+        segments = list(self.segments)
+        segments[self.PAGE_INDEX] = str(page)
+        return f"{self.base}{'-'.join(segments)}.html{self.suffix}"
+
+
+def needs_more_pages(listings: List[DD373Product], filters: List[FilterParams]) -> bool:
+    """True while some filter has no qualifying offer in the listings."""
+    return any(not any(f.apply(product) for product in listings) for f in filters)
+
+
+def has_more_pages(url: str) -> bool:
+    """Whether get_dd373_next_pages may load further pages of the url."""
+    search = DD373SearchUrl.parse(url)
+    return search is not None and search.is_price_sorted and _get_max_pages() > 1
+
+
+def _get_max_pages() -> int:
+    try:
+        return max(1, int(os.getenv("DD_MAX_PAGES")))
+    except Exception:
+        return constants.DD_MAX_PAGES
+
+
+def get_dd373_next_pages(
+    url: str,
+    listings: List[DD373Product],
+    filters: List[FilterParams],
+    driver: DriverSource,
+    max_pages: Optional[int] = None,
+) -> List[DD373Product]:
+    """
+    Extend the listings of a price sorted search url with its following pages
+    until every filter has a qualifying offer: as pages are sorted by price, no
+    later page can hold a cheaper one. Stops at DD_MAX_PAGES pages or at a
+    page without new items. Urls not sorted by price are left at one page.
+
+    Returns:
+        The same listings object when no page was added, a new list otherwise
+    """
+    search = DD373SearchUrl.parse(url)
+    if search is None or not search.is_price_sorted or not needs_more_pages(listings, filters):
+        return listings
+    max_pages = max_pages or _get_max_pages()
+
+    combined = list(listings)
+    previous = listings
+    for page in range(search.page + 1, search.page + max_pages):
+        page_listings = get_dd373_listings(search.with_page(page), driver)
+        # Past the last page the site serves the last page again
+        if not page_listings or page_listings == previous:
+            break
+        print(f"Loaded page {page} of {url}")
+        combined.extend(page_listings)
+        previous = page_listings
+        if not needs_more_pages(combined, filters):
+            break
+    return combined if len(combined) > len(listings) else listings
+
+
+def _rank_rate(product: DD373Product) -> float:
+    # Offers without a readable rate rank after the others on equal price,
+    # the unreadable rate is reported by ListingFingerprints when the page is parsed
+    return product.yuan_per_unit if product.yuan_per_unit is not None else float('inf')
+
+
+def select_best_offers(
+    listOffers: List[DD373Product],
+    filterParams: FilterParams,
+    k: int = 1,
+) -> List[DD373Product]:
+    """
+    The k cheapest offers passing the filter, in one pass with a bounded heap.
+
+    Ties on price go to the lower exchange_rate_2, then to the earlier offer
+    on the page, as with sorting by rate and taking the min price.
+    """
+    candidates = (
+        (offer.price, _rank_rate(offer), index, offer)
+        for index, offer in enumerate(listOffers)
+        if filterParams.apply(offer)
     )
+    return [candidate[3] for candidate in heapq.nsmallest(k, candidates, key=lambda candidate: candidate[:3])]
 
-    # apply filter
-    valid_offers = []
-    for offer in sorted_offers:
-        if filterParams.apply(offer):
-            valid_offers.append(offer)
 
-    return valid_offers
+def _filter_valid_offer_item(listOffers: List[DD373Product], filterParams: FilterParams) -> List[DD373Product]:
+    """Offers passing the filter, sorted by exchange_rate_2."""
+    valid_offers = [offer for offer in listOffers if filterParams.apply(offer)]
+    return sorted(valid_offers, key=_rank_rate)
 
 
-def get_dd_min_price(dd: DD, driver: WebDriver) -> Optional[Tuple[float, str]]:
+def get_dd_min_price(
+    dd: DD,
+    driver: Optional[WebDriver],
+    listings: Optional[List[DD373Product]] = None,
+) -> Optional[Tuple[float, str]]:
     """
     Get the minimum price from the payload
 
     Args:
         dd: DD object gets from payload
+        driver: Selenium driver used to load the listings
+        listings: Already loaded listings of dd.DD_PRODUCT_LINK, if any
 
     Returns:
         Minimum price
     """
-    _filterParams = FilterParams()
-    _filterParams.stock_min = dd.DD_STOCKMIN
-    _filterParams.level_min = dd.DD_LEVELMIN
-    list_offers = []
-    list_offers = get_dd373_listings(dd.DD_PRODUCT_LINK, driver)
-    filter_list = _filter_valid_offer_item(list_offers, _filterParams)
-
-    if not filter_list:
+    _filterParams = FilterParams.from_dd(dd)
+    if listings is None:
+        listings = get_dd373_listings(dd.DD_PRODUCT_LINK, driver)
+        listings = get_dd373_next_pages(dd.DD_PRODUCT_LINK, listings, [_filterParams], driver)
+    if len(listings) >= constants.OFFER_BATCH_MIN_OFFERS:
+        # Vectorized, the batch being shared by the rows of the url
+        min_price_object = get_offer_batch(listings).best(_filterParams)
+    else:
+        best_offers = select_best_offers(listings, _filterParams)
+        min_price_object = best_offers[0] if best_offers else None
+
+    if min_price_object is None:
         return None
-    min_price_object = min(filter_list, key=lambda product: product.price)
 
     min_price = min_price_object.price
     min_seller = min_price_object.title
@@ -253,8 +832,20 @@ def get_dd_min_price(dd: DD, driver: WebDriver) -> Optional[Tuple[float, str]]:
 
 
 if __name__ == "__main__":
-    url = "https://www.dd373.com/s-9fv09v-5tgdjq-55ns9v-0-0-0-3xb9qq-0-0-0-0-0-1-0-3-0.html"
-    listings = get_dd373_listings(url)
+    from utils.selenium_utils import create_selenium_driver
+
+    # A saved page is parsed offline, a url is loaded with a new browser
+    source = sys.argv[1] if len(sys.argv) > 1 \
+        else "https://www.dd373.com/s-9fv09v-5tgdjq-55ns9v-0-0-0-3xb9qq-0-0-0-0-0-1-0-3-0.html"
+    if os.path.isfile(source):
+        with open(source, encoding="utf-8") as f:
+            listings = parse_dd373_listings(f.read())
+    else:
+        driver = create_selenium_driver()
+        try:
+            listings = get_dd373_listings(source, driver)
+        finally:
+            driver.quit()
     for listing in listings:
         print(listing)
 
@@ -8,3 +8,15 @@ class G2GCrawlerError(Exception):
 
 class FUNCrawlerError(Exception):
     pass
+
+
+class DDCrawlerError(Exception):
+    pass
+
+
+class DDChallengeError(DDCrawlerError):
+    pass
+
+
+class DriverCrashedError(Exception):
+    pass
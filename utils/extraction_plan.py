@@ -0,0 +1,204 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import soupsieve
+from bs4 import Tag
+
+# Reads a raw field by name, None when its element is not on the item
+FieldGetter = Callable[[str], Any]
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    A raw item field: what to read from the first element matching selector,
+    inside the item or inside the element of the scope field.
+
+    read is one of text, attr (attribute arg), texts (texts of the arg
+    elements) or count (number of arg elements, 0 without the element).
+    """
+    name: str
+    selector: str
+    read: str = "text"
+    arg: str = ""
+    scope: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class LayoutVariant:
+    """
+    One page layout carrying a value: pattern is searched in the text of field
+    (or in each text of a texts field). Applies only when the requires field
+    was found.
+    """
+    name: str
+    field: str
+    pattern: str
+    requires: Optional[str] = None
+
+
+FIELD_SPECS: Tuple[FieldSpec, ...] = (
+    FieldSpec("title", ".goods-list-title"),
+    FieldSpec("title_href", ".goods-list-title", "attr", "href"),
+    FieldSpec("servers", ".game-qufu-attr", "texts", "a"),
+    FieldSpec("price", ".goods-price"),
+    FieldSpec("reputation", ".game-reputation"),
+    FieldSpec("reputation_bold", ".bold", scope="reputation"),
+    FieldSpec("kucun_span", ".kucun span"),
+    FieldSpec("kucun_rates", ".kucun", "texts", "p"),
+    FieldSpec("width233_rates", ".width233", "texts", "p"),
+    FieldSpec("hearts", ".game-reputation", "count", "i.icon-heart"),
+    FieldSpec("diamonds", ".game-reputation", "count", "i.icon-bluediamond"),
+    FieldSpec("crowns", ".game-reputation", "count", "i.icon-crown"),
+    FieldSpec("buy_href", ".shop-btn-group a.im-buy-btn", "attr", "href"),
+)
+
+# Variants of a value in priority order; a new layout is one more row here
+# (and a FieldSpec if it reads an element not listed above). Only the bs4 path
+# reads FieldSpecs directly: a new field also has to be added to ItemFields and
+# to the other backends, which refuse to run until then (see dd_parsers).
+LAYOUT_VARIANTS: Dict[str, Tuple[LayoutVariant, ...]] = {
+    "stock": (
+        # "库存： 7" or "库存:7" in the reputation block
+        LayoutVariant("reputation-text", "reputation", r"库存\s*[：:]\s*(\d+)"),
+        LayoutVariant("reputation-bold", "reputation_bold", r"^\s*(\d+)\s*$", requires="reputation"),
+        # Layout before the reputation block carried the stock
+        LayoutVariant("kucun-span", "kucun_span", r"^\s*(\d+)\s*$"),
+    ),
+    "exchange_rates": (
+        # 1元=17.5439钻 / 1钻=0.0570元, in the p of .kucun
+        LayoutVariant("kucun", "kucun_rates", r"(?s)^\s*(.*?)\s*$"),
+        # Older layout, only used when .kucun has no p at all
+        LayoutVariant("width233", "width233_rates", r"(?s)^\s*(.*?)\s*$", requires="kucun_rates"),
+    ),
+}
+
+
+def _parse_stock(match_text: Callable[[str], Optional[str]], raw: Any) -> Optional[int]:
+    matched = match_text(raw)
+    if matched is None or int(matched) == 0:
+        # A stock of 0 is no better than not finding it, the next layout is tried
+        return None
+    return int(matched)
+
+
+def _parse_rates(match_text: Callable[[str], Optional[str]], raw: Any) -> Optional[Tuple[str, str]]:
+    if not raw:
+        return None
+    if len(raw) < 2:
+        return "", ""
+    return match_text(raw[0]) or "", match_text(raw[1]) or ""
+
+
+VALUE_PARSERS = {
+    "stock": _parse_stock,
+    "exchange_rates": _parse_rates,
+}
+
+
+@dataclass(frozen=True)
+class _CompiledSpec:
+    spec: FieldSpec
+    selector: Any
+    arg_selector: Any
+
+
+class _CompiledVariant:
+    def __init__(self, variant: LayoutVariant, parse: Callable):
+        self.variant = variant
+        self.regex = re.compile(variant.pattern)
+        self._parse = parse
+
+    def _match_text(self, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        match = self.regex.search(text)
+        return match.group(1) if match else None
+
+    def resolve(self, get: FieldGetter) -> Any:
+        if self.variant.requires is not None and get(self.variant.requires) is None:
+            return None
+        raw = get(self.variant.field)
+        if raw is None:
+            return None
+        return self._parse(self._match_text, raw)
+
+
+class ExtractionPlan:
+    """FIELD_SPECS and LAYOUT_VARIANTS compiled once into selectors and regexes."""
+
+    def __init__(
+        self,
+        field_specs: Tuple[FieldSpec, ...] = FIELD_SPECS,
+        layout_variants: Dict[str, Tuple[LayoutVariant, ...]] = LAYOUT_VARIANTS,
+    ):
+        self.fields: Dict[str, _CompiledSpec] = {
+            spec.name: _CompiledSpec(
+                spec,
+                soupsieve.compile(spec.selector),
+                soupsieve.compile(spec.arg) if spec.read in ("texts", "count") else None,
+            )
+            for spec in field_specs
+        }
+        self.variants = {
+            value: tuple(_CompiledVariant(variant, VALUE_PARSERS[value]) for variant in variants)
+            for value, variants in layout_variants.items()
+        }
+        for variants in layout_variants.values():
+            for variant in variants:
+                for name in (variant.field, variant.requires):
+                    if name is not None and name not in self.fields:
+                        raise ValueError(f"Layout variant {variant.name} reads unknown field {name}")
+
+    def resolve(self, value: str, get: FieldGetter) -> Any:
+        """
+        Value from the first of its variants, in declared order, that can be
+        read on the item. With a lazy getter the fields of later variants are
+        only selected when the earlier ones fail.
+        """
+        for variant in self.variants[value]:
+            result = variant.resolve(get)
+            if result is not None:
+                return result
+        return None
+
+    def reader(self, item: Tag) -> FieldGetter:
+        """
+        Lazy field getter of a BeautifulSoup item: a field is only selected when
+        asked for, elements and values are looked up once per item.
+        """
+        elements: Dict[Tuple[Optional[str], str], Optional[Tag]] = {}
+        values: Dict[str, Any] = {}
+
+        def element(compiled: _CompiledSpec) -> Optional[Tag]:
+            spec = compiled.spec
+            key = (spec.scope, spec.selector)
+            if key not in elements:
+                root = item if spec.scope is None else element(self.fields[spec.scope])
+                elements[key] = compiled.selector.select_one(root) if root is not None else None
+            return elements[key]
+
+        def get(name: str) -> Any:
+            if name not in values:
+                compiled = self.fields.get(name)
+                values[name] = self._read(compiled, element(compiled)) if compiled is not None else None
+            return values[name]
+
+        return get
+
+    @staticmethod
+    def _read(compiled: _CompiledSpec, element: Optional[Tag]) -> Any:
+        read = compiled.spec.read
+        if read == "count":
+            return len(compiled.arg_selector.select(element)) if element is not None else 0
+        if element is None:
+            return None
+        if read == "attr":
+            return element.get(compiled.spec.arg, '')
+        if read == "texts":
+            return [child.text for child in compiled.arg_selector.select(element)]
+        return element.text
+
+
+EXTRACTION_PLAN = ExtractionPlan()
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cachetools import TLRUCache
+
+import constants
+from utils.common_utils import get_env_float
+
+
+def normalize_url(url: str) -> str:
+    """Cache key of a url: lowercase scheme and host, sorted query, no fragment."""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+
+def _parse_ttl_overrides(raw: str) -> Dict[str, float]:
+    """'prefix=seconds,prefix=seconds' from DD_CACHE_TTL_OVERRIDES."""
+    overrides = {}
+    for item in raw.split(","):
+        prefix, _, seconds = item.rpartition("=")
+        try:
+            overrides[normalize_url(prefix)] = float(seconds)
+        except ValueError:
+            if item.strip():
+                print(f"Invalid cache ttl override: {item}")
+    return overrides
+
+
+class _CountingTLRUCache(TLRUCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+
+    def popitem(self):
+        # Only called when the cache is full, so every call is an LRU eviction
+        self.evictions += 1
+        return super().popitem()
+
+
+class ListingCache:
+    """
+    Parsed listings by normalized url, expiring after a per-url TTL and evicting
+    the least recently used urls once more than max_products are cached.
+    """
+
+    def __init__(
+        self,
+        ttl: float | None = None,
+        max_products: int | None = None,
+        ttl_overrides: Dict[str, float] | None = None,
+    ):
+        self.ttl = ttl if ttl is not None else get_env_float("DD_CACHE_TTL", constants.LISTING_CACHE_TTL)
+        max_products = max_products or int(get_env_float("DD_CACHE_MAX_PRODUCTS", constants.LISTING_CACHE_MAX_PRODUCTS))
+        self.ttl_overrides = ttl_overrides if ttl_overrides is not None \
+            else _parse_ttl_overrides(os.getenv("DD_CACHE_TTL_OVERRIDES") or "")
+        self.hits = 0
+        self.misses = 0
+        self._cache = _CountingTLRUCache(
+            maxsize=max_products, ttu=self._time_to_use, timer=time.monotonic, getsizeof=lambda v: max(1, len(v))
+        )
+        self._lock = threading.Lock()
+
+    def ttl_for(self, key: str) -> float:
+        # Longest matching prefix wins
+        for prefix in sorted(self.ttl_overrides, key=len, reverse=True):
+            if key.startswith(prefix):
+                return self.ttl_overrides[prefix]
+        return self.ttl
+
+    def _time_to_use(self, key: str, value: Any, now: float) -> float:
+        return now + self.ttl_for(key)
+
+    def get(self, url: str) -> Optional[List[Any]]:
+        key = normalize_url(url)
+        with self._lock:
+            listings = self._cache.get(key)
+            if listings is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return listings
+
+    def put(self, url: str, listings: List[Any]) -> None:
+        key = normalize_url(url)
+        if self.ttl_for(key) <= 0:
+            return
+        with self._lock:
+            try:
+                self._cache[key] = listings
+            except ValueError:
+                pass  # Larger than the whole cache
+
+    @property
+    def evictions(self) -> int:
+        return self._cache.evictions
+
+    def summary(self) -> str:
+        with self._lock:
+            size = len(self._cache)
+        return (f"Listing cache: {size} urls, {self.hits} hits, {self.misses} misses, "
+                f"{self.evictions} evictions")
+
+
+_listing_cache: Optional[ListingCache] = None
+_listing_cache_lock = threading.Lock()
+
+
+def get_listing_cache() -> ListingCache:
+    """Listing cache of the process, sized from DD_CACHE_* when first requested."""
+    global _listing_cache
+    with _listing_cache_lock:
+        if _listing_cache is None:
+            _listing_cache = ListingCache()
+        return _listing_cache
@@ -0,0 +1,105 @@
+import threading
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+import numpy as np
+from cachetools import LRUCache
+
+if TYPE_CHECKING:
+    from utils.dd_utils import DD373Product, FilterParams
+
+
+@dataclass
+class OfferBatch:
+    """
+    Offers as columns: the numeric fields the filters and the ranking read are
+    NumPy arrays, the strings stay lists next to them, and products keeps the
+    row objects to hand back.
+    """
+    price: np.ndarray  # float64
+    stock: np.ndarray  # int64
+    credit_rating: np.ndarray  # int64
+    rate: np.ndarray  # float64, yuan_per_unit, inf when it could not be read
+    title: List[str]
+    server_info: List[str]
+    products: Sequence["DD373Product"]
+
+    @classmethod
+    def from_products(cls, products: Sequence["DD373Product"]) -> "OfferBatch":
+        count = len(products)
+        return cls(
+            price=np.fromiter(map(attrgetter("price"), products), dtype=np.float64, count=count),
+            stock=np.fromiter(map(attrgetter("stock"), products), dtype=np.int64, count=count),
+            credit_rating=np.fromiter(map(attrgetter("credit_rating"), products), dtype=np.int64, count=count),
+            rate=np.fromiter(
+                (p.yuan_per_unit if p.yuan_per_unit is not None else np.inf for p in products),
+                dtype=np.float64, count=count,
+            ),
+            title=[p.title for p in products],
+            server_info=[p.server_info for p in products],
+            products=products,
+        )
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def mask(self, filter_params: "FilterParams") -> np.ndarray:
+        """FilterParams.apply of every offer at once."""
+        mask = np.ones(len(self), dtype=bool)
+        if filter_params.level_min is not None:
+            mask &= self.credit_rating >= filter_params.level_min
+        if filter_params.stock_min is not None:
+            mask &= self.stock >= filter_params.stock_min
+        return mask
+
+    def argmin(self, mask: Optional[np.ndarray] = None) -> Optional[int]:
+        """
+        Index of the cheapest offer within the mask, ties going to the lower
+        rate then to the earlier offer, as select_best_offers. None if the
+        mask is empty.
+        """
+        candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if not candidates.size:
+            return None
+        prices = self.price[candidates]
+        candidates = candidates[prices == prices.min()]
+        if candidates.size > 1:
+            rates = self.rate[candidates]
+            candidates = candidates[rates == rates.min()]
+        return int(candidates[0])
+
+    def top_k(self, mask: Optional[np.ndarray] = None, k: int = 1) -> List[int]:
+        """Indexes of the k best offers within the mask, best first."""
+        candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if k == 1:
+            best = self.argmin(mask)
+            return [] if best is None else [best]
+        # lexsort: last key is the primary one, the index keeps page order on ties
+        order = np.lexsort((candidates, self.rate[candidates], self.price[candidates]))
+        return candidates[order[:k]].tolist()
+
+    def best(self, filter_params: "FilterParams") -> Optional["DD373Product"]:
+        index = self.argmin(self.mask(filter_params))
+        return self.products[index] if index is not None else None
+
+
+_batches: LRUCache = LRUCache(maxsize=64)
+_batches_lock = threading.Lock()
+
+
+def get_offer_batch(listings: Sequence["DD373Product"]) -> OfferBatch:
+    """
+    Batch of a listings list, built once while it is cached: the rows of a url
+    share the same listings object, each row only pays for its mask.
+    """
+    key = id(listings)
+    with _batches_lock:
+        cached = _batches.get(key)
+        # The listings are kept in the entry, so their id cannot be reused meanwhile
+        if cached is not None and cached[0] is listings and len(cached[1]) == len(listings):
+            return cached[1]
+    batch = OfferBatch.from_products(listings)
+    with _batches_lock:
+        _batches[key] = (listings, batch)
+    return batch
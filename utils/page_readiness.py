@@ -0,0 +1,131 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Dict
+from urllib.parse import urlparse
+
+from selenium.common import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.webdriver.support.wait import WebDriverWait
+
+import constants
+
+
+class ReadinessStrategy(ABC):
+    """
+    A cheap in-page condition, evaluated as a JS expression, telling that a page
+    can be read. Strategies combine with AnyOf/AllOf.
+    """
+    name = "ready"
+
+    @abstractmethod
+    def expression(self) -> str:
+        """JS expression, truthy once the page is ready."""
+
+    def is_ready(self, driver: WebDriver) -> bool:
+        return bool(driver.execute_script(f"return !!({self.expression()});"))
+
+
+class DocumentComplete(ReadinessStrategy):
+    name = "document-complete"
+
+    def expression(self) -> str:
+        return "document.readyState === 'complete'"
+
+
+class SelectorPresent(ReadinessStrategy):
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.name = f"selector:{selector}"
+
+    def expression(self) -> str:
+        return f"document.querySelector({self.selector!r}) !== null"
+
+
+class CookieSet(ReadinessStrategy):
+    def __init__(self, cookie_name: str):
+        self.cookie_name = cookie_name
+        self.name = f"cookie:{cookie_name}"
+
+    def expression(self) -> str:
+        return f"document.cookie.indexOf({(self.cookie_name + '=')!r}) !== -1"
+
+
+class ScriptAbsent(ReadinessStrategy):
+    """Ready once no inline script of the page mentions the marker (e.g. a challenge)."""
+
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.name = f"no-script:{marker}"
+
+    def expression(self) -> str:
+        return (
+            "!Array.prototype.some.call(document.scripts, "
+            f"function (s) {{ return s.text.indexOf({self.marker!r}) !== -1; }})"
+        )
+
+
+class AnyOf(ReadinessStrategy):
+    def __init__(self, *strategies: ReadinessStrategy):
+        self.strategies = strategies
+        self.name = " | ".join(strategy.name for strategy in strategies)
+
+    def expression(self) -> str:
+        return " || ".join(f"({strategy.expression()})" for strategy in self.strategies)
+
+
+class AllOf(ReadinessStrategy):
+    def __init__(self, *strategies: ReadinessStrategy):
+        self.strategies = strategies
+        self.name = " & ".join(strategy.name for strategy in strategies)
+
+    def expression(self) -> str:
+        return " && ".join(f"({strategy.expression()})" for strategy in self.strategies)
+
+
+# Listings rendered, or the page finished loading without the challenge script
+# (an empty search result has no goods-list-item at all).
+DD373_READINESS = AnyOf(
+    SelectorPresent("div.goods-list-item"),
+    AllOf(DocumentComplete(), ScriptAbsent("acw_sc__v2")),
+)
+DEFAULT_READINESS = AllOf(DocumentComplete(), ScriptAbsent("acw_sc__v2"))
+
+READINESS_STRATEGIES: Dict[str, ReadinessStrategy] = {
+    "www.dd373.com": DD373_READINESS,
+    "dd373.com": DD373_READINESS,
+}
+
+
+def register_readiness_strategy(host: str, strategy: ReadinessStrategy) -> None:
+    READINESS_STRATEGIES[host.lower()] = strategy
+
+
+def get_readiness_strategy(url: str) -> ReadinessStrategy:
+    host = (urlparse(url).hostname or "").lower()
+    return READINESS_STRATEGIES.get(host, DEFAULT_READINESS)
+
+
+def wait_until_ready(
+    driver: WebDriver,
+    url: str,
+    timeout: float = constants.TIMEOUT,
+    poll_frequency: float = 0.2,
+) -> float:
+    """
+    Wait until the page of the current window is ready to be read.
+
+    Returns:
+        Seconds spent waiting
+    """
+    strategy = get_readiness_strategy(url)
+    start_time = time.time()
+    try:
+        # The challenge reloads the page, so scripts may fail while navigating
+        WebDriverWait(
+            driver, timeout, poll_frequency=poll_frequency, ignored_exceptions=(WebDriverException,)
+        ).until(strategy.is_ready)
+    except TimeoutException:
+        raise TimeoutException(f"Timeout waiting for {strategy.name} on {url}")
+    wait_time = time.time() - start_time
+    print(f"Page ready in {wait_time:.2f}s ({strategy.name})")
+    return wait_time
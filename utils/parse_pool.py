@@ -0,0 +1,122 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import constants
+from utils.common_utils import get_env_int
+
+# (key, raw html, argument passed to the parse function)
+ParseJob = Tuple[Hashable, bytes, Any]
+# Top level function, so that worker processes can unpickle it
+ParseFunction = Callable[[str, Any], List[tuple]]
+
+
+def _parse_batch(parse: ParseFunction, jobs: List[ParseJob]) -> List[Tuple[Hashable, Union[List[tuple], Exception]]]:
+    results = []
+    for key, html, arg in jobs:
+        try:
+            results.append((key, parse(html.decode("utf-8", errors="replace"), arg)))
+        except Exception as e:
+            results.append((key, e))
+    return results
+
+
+class ParseStage:
+    """
+    Parses raw html pages into compact records on a process pool. Pages
+    smaller than inline_bytes are parsed in the calling thread, the others are
+    grouped into batches of about batch_bytes to pay one round trip per batch.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        inline_bytes: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+    ):
+        self.workers = workers if workers is not None else get_env_int("DD_PARSE_WORKERS", constants.PARSE_WORKERS)
+        self.inline_bytes = inline_bytes if inline_bytes is not None \
+            else get_env_int("DD_PARSE_INLINE_BYTES", constants.PARSE_INLINE_BYTES)
+        self.batch_bytes = batch_bytes or constants.PARSE_BATCH_BYTES
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # spawn: the parent runs driver and sheet threads, which fork would copy mid-flight
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _batches(self, jobs: List[ParseJob]) -> List[List[ParseJob]]:
+        batches: List[List[ParseJob]] = []
+        batch: List[ParseJob] = []
+        size = 0
+        for job in sorted(jobs, key=lambda job: len(job[1]), reverse=True):
+            if batch and size + len(job[1]) > self.batch_bytes:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(job)
+            size += len(job[1])
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def parse_many(self, parse: ParseFunction, jobs: List[ParseJob]) -> Dict[Hashable, Union[List[tuple], Exception]]:
+        """Records per job key; a page that failed to parse maps to its exception."""
+        executor = self._get_executor()
+        inline = [job for job in jobs if executor is None or len(job[1]) < self.inline_bytes]
+        pooled = [job for job in jobs if executor is not None and len(job[1]) >= self.inline_bytes]
+
+        futures: List[Tuple[List[ParseJob], Future]] = []
+        for batch in self._batches(pooled):
+            try:
+                futures.append((batch, executor.submit(_parse_batch, parse, batch)))
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"Parse pool unavailable, parsing in process: {e}")
+                self._reset()
+                inline.extend(batch)
+
+        # Small pages are parsed here while the workers handle the big ones
+        results = dict(_parse_batch(parse, inline))
+        for batch, future in futures:
+            try:
+                results.update(future.result())
+            except BrokenProcessPool as e:
+                print(f"Parse worker died, parsing {len(batch)} pages in process: {e}")
+                self._reset()
+                results.update(_parse_batch(parse, batch))
+        return results
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+_parse_stage: Optional[ParseStage] = None
+_parse_stage_lock = threading.Lock()
+
+
+def get_parse_stage() -> ParseStage:
+    """Parse stage of the process; its worker pool only starts with the first batch to parse."""
+    global _parse_stage
+    with _parse_stage_lock:
+        if _parse_stage is None:
+            _parse_stage = ParseStage()
+            atexit.register(_parse_stage.close)
+        return _parse_stage
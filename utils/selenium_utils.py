@@ -0,0 +1,470 @@
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.webdriver import WebDriver
+from webdriver_manager.chrome import ChromeDriverManager
+
+import constants
+from utils.common_utils import get_env_float
+from utils.cookie_store import get_profile_dir, is_persistent_profile_enabled, preload_cookies
+from utils.exceptions import DriverCrashedError
+
+
+@dataclass
+class ResourcePolicy:
+    """
+    Requests the browser never makes. Patterns use the CDP Network.setBlockedURLs
+    wildcard syntax; scripts are never blocked so the challenge JS still runs.
+    """
+    name: str = "none"
+    blocked_urls: List[str] = field(default_factory=list)
+    block_images: bool = False
+
+
+_STATIC_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.css", "*.mp4",
+]
+_TRACKER_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*hm.baidu.com*", "*cnzz.com*", "*51.la*",
+]
+
+RESOURCE_POLICIES: Dict[str, ResourcePolicy] = {
+    "none": ResourcePolicy(),
+    "trackers": ResourcePolicy(name="trackers", blocked_urls=_TRACKER_PATTERNS),
+    "lean": ResourcePolicy(name="lean", blocked_urls=_STATIC_PATTERNS + _TRACKER_PATTERNS, block_images=True),
+}
+
+
+def get_resource_policy() -> ResourcePolicy:
+    """
+    Policy named by DD_RESOURCE_POLICY, extended with the comma separated
+    patterns of DD_BLOCKED_URLS.
+    """
+    name = (os.getenv("DD_RESOURCE_POLICY") or "none").strip().lower()
+    base = RESOURCE_POLICIES.get(name)
+    if base is None:
+        print(f"Unknown DD_RESOURCE_POLICY '{name}', blocking nothing")
+        base = RESOURCE_POLICIES["none"]
+    extra = [p.strip() for p in (os.getenv("DD_BLOCKED_URLS") or "").split(",") if p.strip()]
+    return ResourcePolicy(name=base.name, blocked_urls=base.blocked_urls + extra, block_images=base.block_images)
+
+
+@dataclass
+class PageLoadStats:
+    pages: int = 0
+    transferred_bytes: int = 0
+    load_time: float = 0.0
+    blocked_requests: int = 0  # Requests the policy's url patterns stopped
+
+    def summary(self) -> str:
+        if not self.pages:
+            return "no pages"
+        return (f"avg {self.transferred_bytes / self.pages / 1024:.1f} KB / "
+                f"{self.load_time / self.pages:.2f}s / {self.blocked_requests / self.pages:.1f} blocked requests "
+                f"over {self.pages} pages")
+
+
+# Per resource policy, so runs with different policies can be compared
+PAGE_LOAD_STATS: Dict[str, PageLoadStats] = {}
+_stats_lock = threading.Lock()
+
+_PAGE_LOAD_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var bytes = nav ? nav.transferSize : 0;
+performance.getEntriesByType('resource').forEach(function (r) { bytes += r.transferSize || 0; });
+return [bytes, nav ? nav.duration / 1000 : 0];
+"""
+
+
+def count_blocked_requests(driver: WebDriver) -> int:
+    """
+    Requests stopped by Network.setBlockedURLs since the last call: the
+    Network.loadingFailed events with a blockedReason of the performance log,
+    which create_selenium_driver enables for policies blocking urls.
+    """
+    if not getattr(driver, "performance_log", False):
+        return 0
+    blocked = 0
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        print(f"Cannot read performance log: {e}")
+        return 0
+    for entry in entries:
+        # Cheap test first, most events are not failures
+        if "Network.loadingFailed" not in entry.get("message", ""):
+            continue
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if message.get("method") == "Network.loadingFailed" and message.get("params", {}).get("blockedReason"):
+            blocked += 1
+    return blocked
+
+
+def record_page_load(driver: WebDriver) -> None:
+    """
+    Count the page for the driver and log bytes transferred, load time and
+    requests blocked for it, under the driver's policy.
+    """
+    driver.pages_loaded = getattr(driver, "pages_loaded", 0) + 1
+    policy = getattr(driver, "resource_policy", None)
+    policy_name = policy.name if policy else "none"
+    try:
+        transferred_bytes, load_time = driver.execute_script(_PAGE_LOAD_SCRIPT)
+    except Exception as e:
+        print(f"Cannot read page load timing: {e}")
+        return
+    blocked = count_blocked_requests(driver)
+    with _stats_lock:
+        stats = PAGE_LOAD_STATS.setdefault(policy_name, PageLoadStats())
+        stats.pages += 1
+        stats.transferred_bytes += int(transferred_bytes or 0)
+        stats.load_time += float(load_time or 0)
+        stats.blocked_requests += blocked
+        summary = stats.summary()
+    print(f"Page load: {int(transferred_bytes or 0) / 1024:.1f} KB in {float(load_time or 0):.2f}s, "
+          f"{blocked} requests blocked (policy {policy_name}, {summary})")
+
+
+def apply_resource_policy(driver: WebDriver) -> None:
+    """
+    Block the policy's urls in the current window. CDP settings are per target,
+    so this has to be repeated for every new tab.
+    """
+    policy = getattr(driver, "resource_policy", None)
+    if policy and policy.blocked_urls:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": policy.blocked_urls})
+
+
+_CHROME_VERSION_RE = re.compile(r"(\d+)\.\d+\.\d+\.\d+")
+_CHROME_BINARIES = [
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+_chromedriver_path: Optional[str] = None
+_chromedriver_lock = threading.Lock()
+
+
+def get_chrome_version() -> Optional[str]:
+    """Version of the installed Chrome, found without any network access."""
+    if sys.platform == "win32":
+        import winreg
+        for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+            try:
+                with winreg.OpenKey(hive, r"Software\Google\Chrome\BLBeacon") as key:
+                    return winreg.QueryValueEx(key, "version")[0]
+            except OSError:
+                continue
+        return None
+    for binary in _CHROME_BINARIES:
+        try:
+            output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = _CHROME_VERSION_RE.search(output)
+        if match:
+            return match.group(0)
+    return None
+
+
+def _load_chromedriver_manifest() -> Dict[str, Any]:
+    try:
+        with open(constants.CHROMEDRIVER_MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_chromedriver_manifest(manifest: Dict[str, Any]) -> None:
+    try:
+        os.makedirs(os.path.dirname(constants.CHROMEDRIVER_MANIFEST_PATH), exist_ok=True)
+        with open(constants.CHROMEDRIVER_MANIFEST_PATH, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    except OSError as e:
+        print(f"Cannot save chromedriver manifest: {e}")
+
+
+def resolve_chromedriver_path() -> str:
+    """
+    Path of a chromedriver matching the installed Chrome major version.
+
+    The manifest under user_data/ maps major versions to downloaded drivers, so
+    webdriver_manager is only consulted when Chrome was updated. When the
+    Chrome version cannot be read, the last driver used is reused.
+    """
+    # Pool drivers start concurrently: one thread downloads and writes the manifest
+    with _chromedriver_lock:
+        return _resolve_chromedriver_path()
+
+
+def _resolve_chromedriver_path() -> str:
+    global _chromedriver_path
+    if _chromedriver_path and os.path.isfile(_chromedriver_path):
+        return _chromedriver_path
+
+    chrome_version = get_chrome_version()
+    major = chrome_version.split(".")[0] if chrome_version else None
+    manifest = _load_chromedriver_manifest()
+    drivers = manifest.setdefault("drivers", {})
+    path = drivers.get(major or manifest.get("last_major", ""))
+    if path and os.path.isfile(path):
+        _chromedriver_path = path
+        return path
+
+    print(f"No cached chromedriver for Chrome {chrome_version or 'unknown'}, downloading")
+    path = ChromeDriverManager().install()
+    if major:
+        drivers[major] = path
+        manifest["last_major"] = major
+        _save_chromedriver_manifest(manifest)
+    _chromedriver_path = path
+    return path
+
+
+def create_selenium_driver(
+    resource_policy: Optional[ResourcePolicy] = None,
+    profile_name: str = "default",
+) -> WebDriver:
+    """
+    Args:
+        resource_policy: requests to block, read from settings when omitted
+        profile_name: browser profile under user_data/ used when DD_PERSIST_PROFILE
+            is on; drivers running at the same time need different profiles
+    """
+    if resource_policy is None:
+        resource_policy = get_resource_policy()
+    options = Options()
+    prefs = {"profile.default_content_setting_values.popups": 2}  # 2 = Block, 1 = Allow
+    if resource_policy.block_images:
+        prefs["profile.managed_default_content_settings.images"] = 2
+    options.add_experimental_option("prefs", prefs)
+    options.add_argument("--disable-notifications")  # Disables browser notification prompts
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])  # Hides "Chrome is being controlled" bar
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    if resource_policy.blocked_urls:
+        # Network events, to count the requests the policy blocked
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    persistent = is_persistent_profile_enabled()
+    if persistent:
+        options.add_argument(f"--user-data-dir={get_profile_dir(profile_name)}")
+    start_time = time.time()
+    driver_path = resolve_chromedriver_path()
+    resolved_time = time.time()
+    driver = webdriver.Chrome(service=Service(driver_path), options=options)
+    driver.resource_policy = resource_policy
+    driver.performance_log = bool(resource_policy.blocked_urls)
+    apply_resource_policy(driver)
+    if persistent:
+        preload_cookies(driver)
+    print(f"Driver created in {time.time() - start_time:.2f}s (chromedriver resolved in "
+          f"{resolved_time - start_time:.2f}s, resource policy: {resource_policy.name})")
+    return driver
+
+
+class DriverSupervisor:
+    """
+    Decides when a driver has to be replaced: it no longer answers, it loaded
+    DRIVER_MAX_PAGES pages, or its Chrome processes use more than
+    DRIVER_MAX_RSS_MB. A limit of 0 disables the check.
+    """
+
+    def __init__(self, max_pages: int | None = None, max_rss_mb: float | None = None):
+        self.max_pages = int(get_env_float("DRIVER_MAX_PAGES", 200)) if max_pages is None else max_pages
+        self.max_rss_mb = get_env_float("DRIVER_MAX_RSS_MB", 1500) if max_rss_mb is None else max_rss_mb
+
+    @staticmethod
+    def is_healthy(driver: WebDriver) -> bool:
+        try:
+            driver.window_handles
+            return True
+        except Exception as e:
+            print(f"Driver health check failed: {e}")
+            return False
+
+    @staticmethod
+    def rss_mb(driver: WebDriver) -> float:
+        """Resident memory of chromedriver and every Chrome process under it."""
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+        except Exception:
+            return 0.0
+        rss = 0
+        for proc in processes:
+            try:
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss / 1024 / 1024
+
+    def needs_recycle(self, driver: WebDriver) -> bool:
+        pages = getattr(driver, "pages_loaded", 0)
+        if self.max_pages and pages >= self.max_pages:
+            print(f"Recycling driver after {pages} pages")
+            return True
+        if self.max_rss_mb:
+            rss = self.rss_mb(driver)
+            if rss >= self.max_rss_mb:
+                print(f"Recycling driver using {rss:.0f} MB")
+                return True
+        return False
+
+
+class DriverPool:
+    """
+    Bounded pool of headless drivers with checkout/checkin semantics.
+
+    Drivers are created lazily, so a pool of N only starts as many browsers
+    as are actually used concurrently. Idle drivers are health checked on
+    checkout and recycled on checkin, dead or recycled ones are replaced by a
+    new driver on the next checkout.
+    """
+
+    def __init__(self, size: int = 1, supervisor: DriverSupervisor | None = None):
+        self.size = max(1, size)
+        self.supervisor = supervisor or DriverSupervisor()
+        self._idle: "queue.Queue[WebDriver]" = queue.Queue()
+        self._drivers: List[WebDriver] = []
+        self._starting: set[int] = set()  # Slots of drivers being created
+        self._lock = threading.Lock()
+
+    def checkout(self, timeout: float | None = None) -> WebDriver:
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+            if driver is None:
+                with self._lock:
+                    can_create = len(self._drivers) < self.size
+                    if can_create:
+                        self._drivers.append(None)  # Reserve the slot while the browser starts
+                        slot = self._free_slot()
+                if can_create:
+                    return self._create(slot)
+                try:
+                    # Poll, a discarded driver frees a slot without a checkin
+                    driver = self._idle.get(timeout=1)
+                except queue.Empty:
+                    if deadline is not None and time.time() > deadline:
+                        raise
+                    continue
+            if self.supervisor.is_healthy(driver):
+                return driver
+            self.discard(driver)
+
+    def _free_slot(self) -> int:
+        used = {getattr(driver, "pool_slot", None) for driver in self._drivers}
+        slot = 0
+        while slot in used or slot in self._starting:
+            slot += 1
+        self._starting.add(slot)
+        return slot
+
+    def _create(self, slot: int) -> WebDriver:
+        try:
+            driver = create_selenium_driver(profile_name=f"pool_{slot}")
+            driver.pool_slot = slot
+        except Exception:
+            with self._lock:
+                self._drivers.remove(None)
+                self._starting.discard(slot)
+            raise
+        with self._lock:
+            self._drivers[self._drivers.index(None)] = driver
+            self._starting.discard(slot)
+        return driver
+
+    def checkin(self, driver: WebDriver) -> None:
+        if self.supervisor.needs_recycle(driver):
+            self.discard(driver)
+        else:
+            self._idle.put(driver)
+
+    def discard(self, driver: WebDriver) -> None:
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error closing driver: {e}")
+
+    @contextmanager
+    def driver(self, timeout: float | None = None) -> Iterator[WebDriver]:
+        """
+        Raises:
+            DriverCrashedError: the driver died while in use, it has been replaced
+        """
+        driver = self.checkout(timeout)
+        try:
+            yield driver
+        except Exception as e:
+            if not self.supervisor.is_healthy(driver):
+                self.discard(driver)
+                raise DriverCrashedError(f"Driver crashed: {e}") from e
+            self.checkin(driver)
+            raise
+        else:
+            self.checkin(driver)
+
+    @contextmanager
+    def lazy_driver(self, timeout: float | None = None) -> Iterator[Callable[[], WebDriver]]:
+        """
+        Same as driver, but yields a provider: the driver is only checked out,
+        and its browser started, on the first call, e.g. when the HTTP engine
+        cannot serve a page.
+
+        Raises:
+            DriverCrashedError: the driver died while in use, it has been replaced
+        """
+        checked_out: List[WebDriver] = []
+
+        def provide() -> WebDriver:
+            if not checked_out:
+                checked_out.append(self.checkout(timeout))
+            return checked_out[0]
+
+        try:
+            yield provide
+        except Exception as e:
+            if checked_out:
+                if not self.supervisor.is_healthy(checked_out[0]):
+                    self.discard(checked_out[0])
+                    raise DriverCrashedError(f"Driver crashed: {e}") from e
+                self.checkin(checked_out[0])
+            raise
+        else:
+            if checked_out:
+                self.checkin(checked_out[0])
+
+    def close(self) -> None:
+        with self._lock:
+            for driver in filter(None, self._drivers):
+                try:
+                    driver.quit()
+                except Exception as e:
+                    print(f"Error closing driver: {e}")
+            self._drivers.clear()
+            self._idle = queue.Queue()